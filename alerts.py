@@ -0,0 +1,181 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+import streamlit as st
+
+from profiling import profiled, profiled_cache
+
+logger = logging.getLogger(__name__)
+
+# Threshold alerts, evaluated headless. `python alerts.py` (or `--interval SECONDS`, or from cron) reads the datasets
+# from DATA_SOURCE, reduces them to the precomputed aggregates the Overview already uses, the price-volume-mix rollup
+# of delta_data (pvm.py) and the period prefix index of user_data (periods.py), and lays every metric of every segment
+# out as one long frame: the total and each level of the channel and product hierarchies, down to customers and SKUs.
+# All rules are then checked in one vectorized comparison against that frame, and the alerts that fire replace the
+# alerts store (ALERTS_PATH) atomically. The Overview only reads the store, so the alerts are there at login without
+# anyone opening the page or setting its thresholds first.
+#
+# Rules come from the JSON file ALERT_RULES, in the format of RULES: a metric (see metric_names), "below" or "above"
+# a threshold, and optionally the "levels" it applies to (every level by default).
+
+
+RULES = [
+    {"name": "Delta Price below target", "metric": "Delta Price %", "below": 5},
+    {"name": "Delta Volume below target", "metric": "Delta Volume %", "below": 1},
+    {"name": "YTD revenue decline", "metric": "YTD Revenue Growth %", "below": 0},
+]
+
+# Growth metric -> the summed user_data column, for every period of periods.PERIODS ("YTD Revenue Growth %", ...)
+GROWTH = {"Revenue Growth %": "Revenue", "GM Growth %": "Total GM [CAD]", "Quantity Growth %": "QTY [Units]"}
+
+
+def alerts_path():
+    return os.environ.get("ALERTS_PATH", os.path.join("alerts", "alerts.parquet"))
+
+def metric_names():
+    from periods import PERIODS
+    from pvm import EFFECTS
+    return [f"{effect} %" for effect in EFFECTS] + [f"{period} {name}" for period in PERIODS for name in GROWTH]
+
+def load_rules():
+    """The rules of ALERT_RULES, or RULES when it isn't set; raises ValueError on a malformed rule."""
+    path = os.environ.get("ALERT_RULES")
+    rules = RULES
+    if path:
+        with open(path) as file:
+            rules = json.load(file)
+    metrics = metric_names()
+    for rule in rules:
+        if rule.get("metric") not in metrics:
+            raise ValueError(f"unknown metric {rule.get('metric')!r} in rule {rule.get('name')!r}, "
+                             f"expected one of {metrics}")
+        if ("below" in rule) == ("above" in rule):
+            raise ValueError(f"rule {rule.get('name')!r} needs exactly one of 'below' and 'above'")
+    return rules
+
+def latest_month(users, year):
+    """The last month of `year` with sales, the as-of month of the year-to-date figures."""
+    from utils import MONTHS_ORDER
+    months = set(users.loc[users["YEAR"] == year, "MONTH"]) & set(MONTHS_ORDER)
+    if not months:
+        raise ValueError(f"user_data has no sales in {year}, the current year of delta_data")
+    return max(months, key=MONTHS_ORDER.index)
+
+@profiled
+def segment_metrics(users, delta):
+    """
+    (frame of Level, Segment, Metric and Value for every metric of every segment, year, as-of month): the delta effects
+    over the year to date and the period growths, both up to the last month with sales in delta_data's current year.
+    """
+    import pandas as pd
+    from periods import DIMENSIONS, PERIODS, build_index, growth
+    from pvm import EFFECTS, delta_years, rollup
+    from utils import MONTHS_ORDER
+
+    year = delta_years(delta)[1]
+    month = latest_month(users, year)
+    frames = []
+
+    def add(level, segments, metric, values):
+        frames.append(pd.DataFrame({"Level": level, "Segment": segments, "Metric": metric, "Value": values}))
+
+    to_date = delta[delta["MONTH"].isin(MONTHS_ORDER[:MONTHS_ORDER.index(month) + 1])]
+    for grouping_set, sums in rollup(to_date).items():
+        level = grouping_set[-1] if grouping_set else "Total"
+        segments = sums[level].to_numpy() if grouping_set else ["Total"] * len(sums)
+        for effect in EFFECTS:
+            add(level, segments, f"{effect} %", sums[f"{effect} %"].to_numpy())
+
+    index = build_index(users)
+    for period in PERIODS:
+        for name, measure in GROWTH.items():
+            for dimension in DIMENSIONS:
+                growths = growth(index, dimension, period, year, month, measure)
+                add(dimension or "Total", growths.iloc[:, 0].to_numpy(), f"{period} {name}",
+                    growths["Growth %"].to_numpy())
+    return pd.concat(frames, ignore_index=True), year, month
+
+@profiled
+def evaluate(metrics, rules):
+    """The metrics rows that break a rule, one row per (rule, segment), the furthest past its threshold first."""
+    import numpy as np
+    import pandas as pd
+    # One row per rule and level it applies to; a rule without levels matches every level (Rule Level is None)
+    table = pd.DataFrame([{"Rule": rule["name"], "Metric": rule["metric"],
+                           "Condition": "below" if "below" in rule else "above",
+                           "Threshold": float(rule.get("below", rule.get("above"))), "Rule Level": level}
+                          for rule in rules for level in rule.get("levels") or [None]],
+                         columns=["Rule", "Metric", "Condition", "Threshold", "Rule Level"])
+    pairs = metrics.merge(table, on="Metric")
+    value, threshold = pairs["Value"].to_numpy(dtype=float), pairs["Threshold"].to_numpy()
+    below = (pairs["Condition"] == "below").to_numpy()
+    fired = np.where(below, value < threshold, value > threshold)
+    applies = (pairs["Rule Level"].isna() | (pairs["Rule Level"] == pairs["Level"])).to_numpy()
+    alerts = pairs[fired & applies].drop(columns="Rule Level")
+    alerts = alerts.assign(Gap=(alerts["Value"] - alerts["Threshold"]).abs()).sort_values("Gap", ascending=False)
+    order = {rule["name"]: position for position, rule in enumerate(rules)}
+    alerts = alerts.sort_values("Rule", key=lambda rule: rule.map(order), kind="stable")
+    return alerts.drop(columns="Gap").reset_index(drop=True)
+
+def write_alerts(alerts, year, month, path=None):
+    """Replace the alerts store atomically (the Overview reads the old or the new alerts, never a partial file)."""
+    path = path or alerts_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    alerts.assign(Year=year, **{"As Of": month}).to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+
+def run(rules):
+    """Evaluate `rules` on the current datasets and write the alerts store; returns the alerts."""
+    from utils import fetch_data
+    metrics, year, month = segment_metrics(fetch_data("users"), fetch_data("delta"))
+    alerts = evaluate(metrics, rules)
+    write_alerts(alerts, year, month)
+    return alerts
+
+
+# ------------------------------- OVERVIEW -------------------------------
+@profiled_cache(st.cache_data, max_entries=2, show_spinner=False)
+def read_alerts(path, modified):
+    """The alerts store at `path`, cached on its modification time."""
+    import pandas as pd
+    return pd.read_parquet(path)
+
+def latest_alerts():
+    """(alerts, evaluation time in seconds) from the alerts store, or (None, None) before its first evaluation."""
+    path = alerts_path()
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None, None
+    return read_alerts(path, modified), modified / 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the threshold alert rules and write the alerts store.")
+    parser.add_argument("--interval", type=float, help="evaluate every INTERVAL seconds instead of once")
+    args = parser.parse_args()
+    rules = load_rules()
+
+    from utils import load_dataset
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
+    while True:
+        load_dataset.clear()  # reread the datasets every round
+        try:
+            alerts = run(rules)
+        except Exception:
+            if args.interval is None:
+                raise
+            # A failed round (MongoDB unreachable, a file mid-rewrite) keeps the last store; the next round retries
+            logger.exception("alert evaluation failed, retrying in %g s", args.interval)
+        else:
+            logger.info("wrote %s alerts to %s", f"{len(alerts):,}", alerts_path())
+        if args.interval is None:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
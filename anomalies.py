@@ -0,0 +1,95 @@
+import os
+
+import streamlit as st
+
+from profiling import profiled, profiled_cache
+
+# Exceptions in the year-over-year deltas. The delta rows of the selected months are summed per customer x SKU cell and
+# each cell's Delta Price % and Delta Volume % (see pvm.py) is scored against its peers, the cells of the same channel
+# and product category, with a robust z-score: 0.6745 x (value - peer median) / the peers' median absolute deviation.
+# Unlike a mean and standard deviation, a handful of extreme cells can't drag the median and MAD towards themselves
+# and hide each other. Where more than half the peers share a value the MAD is 0, so the mean absolute deviation
+# (x 1.2533, its ratio to the standard deviation) takes its place. Medians of every peer group come from one sort
+# of all cells by (group, value), read at each group's middle positions, so there is no loop over groups.
+
+
+# The cells scored, and the columns of their peer groups
+CELL_KEYS = ["Channel Category", "Product Category", "Customer Name", "Product SKU"]
+PEERS = ["Channel Category", "Product Category"]
+
+# Scored delta -> the column of its robust z-score
+MEASURES = {"Delta Price %": "Price Robust z", "Delta Volume %": "Volume Robust z"}
+
+# Peer groups smaller than this leave their cells unscored
+MIN_PEERS = int(os.environ.get("ANOMALY_MIN_PEERS", 5))
+
+# Exceptions shown per page of the Overview list
+PAGE_ROWS = 25
+
+
+@profiled_cache(st.cache_resource, max_entries=8, show_spinner=False)  # computed on the chart pool
+def get_scored_cells(data_key, months, _delta):
+    """The scored cells of delta rows, cached on their source key and selected months."""
+    return score_cells(cell_deltas(_delta))
+
+@profiled
+def cell_deltas(df):
+    """The delta rows summed per customer x SKU cell, with their price, volume and mix effects."""
+    from pvm import effects, leaf_sums
+    sums = leaf_sums(df).groupby([df[key] for key in CELL_KEYS], sort=False, observed=True).sum().reset_index()
+    return effects(sums)
+
+def grouped_median(codes, values, size):
+    """The median of `values` per integer code (NaN for a code without values), from one sort by (code, value)."""
+    import numpy as np
+    order = np.argsort(values)
+    # A stable sort by code keeps each group's values in order; on 8 or 16-bit codes it is a radix sort
+    order = order[np.argsort(codes.astype(np.min_scalar_type(max(size - 1, 0)))[order], kind="stable")]
+    ordered = values[order]
+    counts = np.bincount(codes, minlength=size)
+    starts = np.cumsum(counts) - counts
+    low, high = starts + np.maximum(counts - 1, 0) // 2, starts + counts // 2
+    medians = np.full(size, np.nan)
+    has = counts > 0
+    medians[has] = (ordered[low[has]] + ordered[high[has]]) / 2
+    return medians
+
+@profiled
+def robust_z(codes, values, size):
+    """(each value's robust z-score within its group, its group's median); NaN where the group is too small or flat."""
+    import numpy as np
+    valid = np.isfinite(values)
+    valid_codes, valid_values = codes[valid], values[valid]
+    median = grouped_median(valid_codes, valid_values, size)
+    deviation = np.abs(valid_values - median[valid_codes])
+    mad = grouped_median(valid_codes, deviation, size) / 0.6745
+    counts = np.bincount(valid_codes, minlength=size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_ad = np.bincount(valid_codes, weights=deviation, minlength=size) / counts * 1.2533
+        scale = np.where(mad > 0, mad, mean_ad)
+        scale = np.where((counts >= MIN_PEERS) & (scale > 0), scale, np.nan)
+        z = np.full(len(values), np.nan)
+        z[valid] = (valid_values - median[valid_codes]) / scale[valid_codes]
+    return z, median[codes]
+
+@profiled
+def score_cells(cells):
+    """Add each measure's peer median and robust z-score to the cells."""
+    from elasticity import series_codes
+    codes, groups = series_codes(cells, PEERS)
+    size = len(groups)
+    for measure, z_column in MEASURES.items():
+        z, median = robust_z(codes, cells[measure].to_numpy(dtype=float), size)
+        cells[f"{measure} Peer Median"], cells[z_column] = median, z
+    return cells
+
+@profiled
+def exceptions(cells, measure, threshold):
+    """The cells whose `measure` scores at least `threshold` away from their peers, the furthest first."""
+    import numpy as np
+    z = cells[MEASURES[measure]].to_numpy()
+    with np.errstate(invalid="ignore"):
+        flagged = np.flatnonzero(np.abs(z) >= threshold)
+    ranked = flagged[np.argsort(-np.abs(z[flagged]), kind="stable")]
+    columns = CELL_KEYS + [measure, f"{measure} Peer Median", MEASURES[measure], "Revenue Prior", "Revenue Current"]
+    return cells.iloc[ranked][columns].reset_index(drop=True)
@@ -1,169 +1,340 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
 
+from metrics import start_exporter, track_session
+from profiling import profile, submit
+# Plotting (plotly, pandas) is imported by the page renderers, so the login screen only pays for streamlit and utils.
 from utils import *
-from plots.plots import *
 
 
 
 setup_app()
 initialize_session_state()
 authenticate()
-users, delta, _ = get_mongo_collections()
-
-
-def main():
-    if st.session_state['authenticated']:
-        # ------------------------------- Data Fetching -------------------------------
-        df = fetch_data(users)
-        delta_df = fetch_data(delta)
-
-        # ------------------------------- Menu -------------------------------
-        menu = option_menu(menu_title=None, menu_icon=None, orientation="horizontal",
-                           options=["Overview","Summary Charts", "Price Analysis", "Customer Insights", "Product Performance"])
-        if menu == "Overview":
-            # ------------------------------- Welcome Messages -------------------------------
-            df_year_1, df_year_2, delta_df_filtered = get_notification_filters(df, delta_df)
-            show_dataframe = st.sidebar.checkbox("Show Dataframe", value=False)
+start_exporter()
+track_session()
+
+
+# ------------------------------- Pages -------------------------------
+# Pages are fragments: a sidebar widget change reruns only the fragment that reads it, not the whole script
+# (authentication, menu and data fetching are left untouched). Each fragment's inputs are its arguments.
+@st.fragment
+@profile("Overview")
+def render_overview(users, delta):
+    from plots.parallel import build_figures, get_pool
+
+    # ------------------------------- Alerts -------------------------------
+    # The alerts store is evaluated on DATA_SOURCE; a session on an upload (see utils.get_upload) isn't that dataset
+    from alerts import latest_alerts
+    if isinstance(users.key, tuple) and users.key[0] == "upload":
+        st.caption("Threshold alerts are evaluated on the configured data source, not on uploaded files.")
+    else:
+        overview_alerts(*latest_alerts())
+
+    # ------------------------------- Welcome Messages -------------------------------
+    _, _, delta_months, (year, months) = get_notification_filters(users, delta)
+    delta_df_filtered = delta_months.rows()
+
+    # The delta rollup, exception scores and three charts are independent: start them all before drawing anything
+    from anomalies import get_scored_cells
+    delta_rollup_future = submit(get_pool(), get_delta_rollup, delta_df_filtered)
+    scored_cells_future = submit(get_pool(), get_scored_cells, delta.key, months, delta_df_filtered)
+    figures = build_figures([
+        ("delta_qty_wrt_channel_category", delta_df_filtered), ("delta_qty_wrt_product_category", delta_df_filtered),
+        ("rev_wrt_year_channel_n_product_category", delta_df_filtered),
+    ])
+
+    # Growth up to the latest selected month, against the same period last year
+    from periods import PERIODS, get_period_index
+    period = st.sidebar.selectbox("Growth Period", list(PERIODS), index=list(PERIODS).index("YTD"))
+    as_of = max(months, key=MONTHS_ORDER.index)
+    overall_growth, max_growth_channel, min_growth_channel = get_notification_revenue_growth(
+        get_period_index(users.key, users), year, as_of, period)
+
+    # Notifications for Revenue Growth
+    if overall_growth is None:
+        st.info(f"Not enough history to compare {period} Revenue to {as_of} {year} with the same period last year.")
+    elif overall_growth > 0:
+        st.success(f"Great news! {period} Revenue to {as_of} {year} has grown by {overall_growth:.2f}% vs the same period last year, thanks to {max_growth_channel['Channel Category']} channel which grew by {max_growth_channel['Revenue Growth']:.2f}%!", icon="🚀")
+    elif overall_growth < 0:
+        st.error(f"Bad news! {period} Revenue to {as_of} {year} has declined by {abs(overall_growth):.2f}% vs the same period last year, due to {min_growth_channel['Channel Category']} channel which made a loss by {abs(min_growth_channel['Revenue Growth']):.2f}%!", icon="📉")
+    else:
+        st.info(f"No change in {period} Revenue to {as_of} {year} compared to the same period last year.", icon="�")
+
+    # ------------------------------- Delta Price & Volume -------------------------------
+    delta_rollup = delta_rollup_future.result()
+    overview_delta_notifications(get_notification_delta(delta_rollup, 'Delta Price %'), get_notification_delta(delta_rollup, 'Delta Volume %'))
+    overview_exceptions(scored_cells_future.result())
+
+    # ------------------------------- Quick Analysis -------------------------------
+    overview_rankings(users, year, months)
+    overview_charts(figures)
+
+    # ------------------------------- End Overview -------------------------------
+
+def overview_alerts(alerts, evaluated):
+    """The threshold alerts of the last scheduled evaluation (see alerts.py), if it has run."""
+    if alerts is None:
+        return
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(evaluated))
+    if not len(alerts):
+        st.success(f"No threshold alerts at the last evaluation ({when}).", icon="✅")
+        return
+    counts = ", ".join(f"{rule} ({count:,})" for rule, count in alerts.groupby("Rule", sort=False).size().items())
+    st.warning(f"{len(alerts):,} threshold alerts to {alerts['As Of'].iloc[0]} {alerts['Year'].iloc[0]} at the last "
+               f"evaluation ({when}): {counts}.", icon="🔔")
+    with st.expander("Alerts"):
+        st.dataframe(alerts.drop(columns=["Year", "As Of"]), use_container_width=True, hide_index=True)
+
+@st.fragment
+def overview_delta_notifications(delta_price_summary, delta_volume_summary):
+    """Threshold banners; the thresholds and "Show Dataframe" only rerun this fragment."""
+    show_dataframe = st.sidebar.checkbox("Show Dataframe", value=False)
+    st.sidebar.markdown("""---""")
+    delta_price_threshold = st.sidebar.number_input("Delta Price %", min_value=0, max_value=100, value=5, step=1)
+
+    # Notifications for Delta Price
+    if delta_price_summary['overall_delta_pct'] > delta_price_threshold:  # Assuming 5% is your yearly target for Delta Price
+        st.success(f"The overall Delta Price is {delta_price_summary['overall_delta_pct']:.2f}% which is above your yearly target. Great job!", icon="☺")
+        if show_dataframe: st.dataframe(delta_price_summary['pivot_table'], use_container_width=True)
+    else:
+        st.error(f"The overall Delta Price is {delta_price_summary['overall_delta_pct']:.2f}%. Please review the pricing strategy.", icon="🚨")
+        if show_dataframe: st.dataframe(delta_price_summary['pivot_table'], use_container_width=True)
 
+    # Highlighting the highest and lowest Delta Price
+    st.info(f"Highest Delta Price: {delta_price_summary['highest_delta_pct']:.2f}% in {delta_price_summary['highest_channel']} ({delta_price_summary['highest_sub_channel']}), by customer {delta_price_summary['highest_customer']}.", icon="🔼")
+    st.info(f"Lowest Delta Price: {delta_price_summary['lowest_delta_pct']:.2f}% in {delta_price_summary['lowest_channel']} ({delta_price_summary['lowest_sub_channel']}), by customer {delta_price_summary['lowest_customer']}. This requires immediate attention.", icon="🔽")
 
-            overall_growth, max_growth_channel, min_growth_channel = get_notification_revenue_growth(df_year_1, df_year_2)
+    delta_volume_threshold = st.sidebar.number_input("Delta Volume %", min_value=0, max_value=100, value=1, step=1)
 
-            # Notifications for Revenue Growth
-            if overall_growth > 0:
-                st.success(f"Great news! YTD Revenue has grown this month by {overall_growth:.2f}% vs prior year, thanks to {max_growth_channel['Channel Category']} channel which grew by {max_growth_channel['YTD Revenue Growth']:.2f}%!", icon="🚀")
-            elif overall_growth < 0:
-                st.error(f"Bad news! YTD Revenue has declined this month by {abs(overall_growth):.2f}% vs prior year, due to {min_growth_channel['Channel Category']} channel which made a loss by {abs(min_growth_channel['YTD Revenue Growth']):.2f}%!", icon="📉")
-            else:
-                st.info(f"No change in YTD Revenue this month compared to prior year.", icon="�")
+    # Notifications for Delta Volume
+    if delta_volume_summary['overall_delta_pct'] < delta_volume_threshold:  # Assuming 1% is the minimum acceptable Delta Volume
+        st.error(f"The overall Delta Volume is {delta_volume_summary['overall_delta_pct']:.2f}% which is below your yearly target. This is concerning and needs a deep dive.", icon="🚨")
+        if show_dataframe: st.dataframe(delta_volume_summary['pivot_table'], use_container_width=True)
+    else:
+        st.success(f"The overall Delta Volume is {delta_volume_summary['overall_delta_pct']:.2f}%, which is above your yearly target. Excellent performance!", icon="☺")
+        if show_dataframe: st.dataframe(delta_volume_summary['pivot_table'], use_container_width=True)
+
+    # Highlighting the highest and lowest Delta Volume
+    st.info(f"Highest Delta Volume: {delta_volume_summary['highest_delta_pct']:.2f}% in {delta_volume_summary['highest_channel']} ({delta_volume_summary['highest_sub_channel']}), by customer {delta_volume_summary['highest_customer']}.", icon="🔼")
+    st.info(f"Lowest Delta Volume: {delta_volume_summary['lowest_delta_pct']:.2f}% in {delta_volume_summary['lowest_channel']} ({delta_volume_summary['lowest_sub_channel']}), by customer {delta_volume_summary['lowest_customer']}. Critical review required.", icon="🔽")
+
+@st.fragment
+def overview_exceptions(cells):
+    """Customer x SKU cells with an outlier delta among their peers; the controls and pages only rerun this fragment."""
+    from anomalies import MEASURES, PAGE_ROWS, exceptions
+
+    st.subheader("Exceptions")
+    controls = st.columns([1, 1, 1, 3])
+    measure = controls[0].selectbox("Exceptions in", list(MEASURES))
+    threshold = controls[1].number_input("Robust z at least", min_value=1.0, max_value=20.0, value=3.5, step=0.5)
+    ranked = exceptions(cells, measure, threshold)
+    pages = max(-(-len(ranked) // PAGE_ROWS), 1)
+    page = controls[2].number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                                    key=f"exceptions page {measure} {threshold}")  # a new list starts at page 1
+    st.caption(f"{len(ranked):,} of {len(cells):,} customer x SKU cells are at least {threshold:g} robust z-scores "
+               f"from the median {measure} of their channel and product category")
+    st.dataframe(ranked.iloc[(page - 1) * PAGE_ROWS:page * PAGE_ROWS], use_container_width=True, hide_index=True)
+
+@st.fragment
+def overview_rankings(users, year, months):
+    """Top-N customers and product ranges from the ranking index; its controls and drill-downs only rerun this fragment."""
+    from rankings import MEASURES, get_ranking_index
+
+    index = get_ranking_index(users.key, users)
+    controls = st.columns([1, 1, 4])
+    n = controls[0].number_input("Top N", min_value=3, max_value=50, value=10, step=1)
+    measure = controls[1].selectbox("Rank by", list(MEASURES))
+
+    row_0 = st.columns(2)
+    for column, (dimension, label) in zip(row_0, [("Customer Name", "Customers"), ("Product Range", "Products")]):
+        with column:
+            ranking_chart(index, dimension, label, year, months, n, measure)
+
+def ranking_chart(index, dimension, label, year, months, n, measure):
+    """One ranking; clicking a bar drills into that value's breakdown (see rankings.LEVELS) until "Back" is pressed."""
+    from plots.plots import top_n_bar
+    from rankings import LEVELS, top_n
+
+    drill_key, chart_key = f"drill {dimension}", f"ranking {dimension}"
+    parent = st.session_state.get(drill_key)
+    ranking = top_n(index, dimension, year, months, n, measure, parent)
+
+    def drill():
+        points = st.session_state[chart_key].selection.points
+        if points:
+            st.session_state[drill_key] = points[0]["x"]
+
+    if parent is None:
+        st.plotly_chart(top_n_bar(ranking, f"Top {n} {label} by {measure}"), use_container_width=True,
+                        on_select=drill, selection_mode="points", key=chart_key)
+    else:
+        st.plotly_chart(top_n_bar(ranking, f"Top {n} {LEVELS[dimension]} in {parent} by {measure}"), use_container_width=True)
+        st.button(f"Back to all {label.lower()}", key=f"back {dimension}", on_click=st.session_state.pop, args=(drill_key,))
+
+def overview_charts(figures):
+    """Place the quick analysis figures (two delta charts, revenue) in order."""
+    delta_by_channel, delta_by_product, revenue = figures
+
+    row_1 = st.columns(2)
+    row_1[0].plotly_chart(delta_by_channel, use_container_width=True)
+    row_1[1].plotly_chart(delta_by_product, use_container_width=True)
+
+    st.plotly_chart(revenue, use_container_width=True)
+
+@st.fragment
+@profile("What-If Simulator")
+def render_simulator(users):
+    from whatif import get_base
+    df_filtered, selection = apply_filters(users, SIMULATOR_FILTERS, sidebar_choice)
+    simulator_scenario(get_base(users.key, selection, df_filtered), users)
+
+# The simulator's KPI cards: each is drawn for the scenario with the data as its delta reference
+SIMULATOR_CARDS = ["sales_revenue_card", "units_sold_card", "profit_margin_card", "average_selling_price_card",
+                   "average_discount_rate_card"]
+
+@st.fragment
+def simulator_scenario(base, users):
+    """The scenario controls and results; moving a slider reprices the cached base and reruns only this fragment."""
+    from elasticity import get_elasticities
+    from plots import plots
+    from whatif import SEGMENTS, by_segment, estimated_elasticity, monthly, simulate
+
+    if not len(base["month"]):
+        st.info("No sales match the selected filters: widen the selection to simulate a scenario.")
+        return
+
+    st.subheader("List Price Change")
+    segment = SEGMENTS["list price"]
+    columns = st.columns(max(len(base["labels"][segment]), 1))
+    list_change = {label: column.slider(str(label), -20, 20, 0, format="%d%%", key=f"list price {label}") / 100
+                   for column, label in zip(columns, base["labels"][segment])}
+
+    st.subheader("Special Discount (DSP) Cap")
+    segment = SEGMENTS["DSP cap"]
+    highest = float(base["Special Discount [DSP %]"].max(initial=0)) * 100
+    if highest > 0:
+        columns = st.columns(max(len(base["labels"][segment]), 1))
+        dsp_cap = {label: column.slider(str(label), 0.0, highest, highest, step=0.5, format="%.1f%%",
+                                        key=f"DSP cap {label}") / 100
+                   for column, label in zip(columns, base["labels"][segment])}
+    else:  # a slider needs a range: with no DSP given there is nothing to cap
+        st.caption("No special discount is given in the selection.")
+        dsp_cap = {}
+
+    elasticity = st.slider("Price elasticity of demand (0 keeps volumes unchanged)", -3.0, 0.0, 0.0, step=0.1)
+    if st.checkbox("Use the estimated elasticity of each SKU and channel (the slider's where there is none)"):
+        elasticity = estimated_elasticity(base, get_elasticities(users.key, "SKU x Channel", users), elasticity)
+
+    lines = simulate(base, list_change, dsp_cap, elasticity)
+    scenario = monthly(base, lines)
+    cards = st.columns(len(SIMULATOR_CARDS))
+    for column, name in zip(cards, SIMULATOR_CARDS):
+        builder = getattr(plots, name)
+        reference = builder(base["baseline"]).data[0].value
+        figure = builder(scenario).update_traces(mode="number+delta", delta={"reference": reference},
+                                                 selector=dict(type="indicator"))
+        column.plotly_chart(figure, use_container_width=True)
+
+    # Revenue and GM per segment, the data's next to the scenario's
+    baseline = simulate(base)
+    for segment in SEGMENTS.values():
+        columns = [segment, "Revenue", "Total GM [CAD]"]
+        table = by_segment(base, baseline, segment)[columns].merge(
+            by_segment(base, lines, segment)[columns], on=segment, suffixes=("", " (Scenario)"))
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+@st.fragment
+def render_chart_page(name, page, source):
+    """Apply the page's sidebar filters, build (or reuse) all of its charts, then lay them out row by row."""
+    from plots.parallel import page_columns, page_figures
+
+    with profile(name):
+        df_filtered, selection = apply_filters(source, page["filters"], sidebar_choice, page_columns(page))
+        charts = tuple(chart for row in page["charts"] for chart in row)
+        figures = page_figures(charts, selection, (source.key,), df_filtered, page.get("processes", False))
+
+        position = 0
+        for row in page["charts"]:
+            for column, figure in zip(st.columns(len(row)), figures[position:position + len(row)]):
+                column.plotly_chart(figure, use_container_width=True)
+            position += len(row)
+
+
+# Each menu entry declares the datasets it reads and how it renders: either a custom function or a filter cascade
+# (see utils.apply_filters) plus rows of chart builders, named by their function in plots/plots.py. Only the active
+# page's datasets are opened, as queries on the configured compute backend (see utils.get_source).
+# Set "processes": True on a page to build its charts in worker processes instead of threads.
+PAGES = {
+    "Overview": {
+        "datasets": ["users", "delta"],
+        "render": render_overview,
+    },
+    "Summary Charts": {
+        "datasets": ["delta"],
+        "filters": SUMMARY_FILTERS,
+        "charts": [
+            ["summary_rev_sum_card", "summary_delta_price_sum_card", "summary_delta_price_perct_card", "summary_delta_volume_sum_card", "summary_delta_volume_perct_card"],
+            ["delta_qty_wrt_channel_category", "rev_sum_wrt_channel_category"],
+            ["rev_wrt_channel_category_and_prod_family"],
+        ],
+    },
+    "Price Analysis": {
+        "datasets": ["users"],
+        "filters": PRICE_FILTERS,
+        "charts": [
+            ["sales_revenue_card", "units_sold_card", "profit_margin_card", "average_discount_rate_card"],
+            ["average_selling_price_card", "list_price_sales_card", "net_sales_card"],
+            ["unit_sold_wrt_campaign", "price_elasticity"],
+            ["discount_evo"],
+            ["price_waterfall", "price_leakage"],
+        ],
+    },
+    "Customer Insights": {
+        "datasets": ["users"],
+        "filters": CUSTOMER_FILTERS,
+        "charts": [
+            ["avg_unit_prc"],
+            ["avg_unit_prc_per_customer"],
+        ],
+    },
+    "Product Performance": {
+        "datasets": ["users"],
+        "filters": PRODUCT_FILTERS,
+        "charts": [
+            ["average_list_price_card", "total_prod_qty_card", "total_prod_rev_card", "total_prod_GM_card"],
+            ["monthly_rev_gm", "product_performance"],
+            ["customer_distribution", "channel_distribution"],
+        ],
+    },
+    "What-If Simulator": {
+        "datasets": ["users"],
+        "render": render_simulator,
+    },
+}
 
-            # ------------------------------- Delta Price & Volume -------------------------------
-            st.sidebar.markdown("""---""")
-            delta_price_threshold = st.sidebar.number_input("Delta Price %", min_value=0, max_value=100, value=5, step=1)
-            delta_price_summary = get_notification_delta(delta_df_filtered, 'Delta Price %')
 
-            # Notifications for Delta Price
-            if delta_price_summary['overall_delta_pct'] > delta_price_threshold:  # Assuming 5% is your yearly target for Delta Price
-                st.success(f"The overall Delta Price is {delta_price_summary['overall_delta_pct']:.2f}% which is above your yearly target. Great job!", icon="☺")
-                if show_dataframe: st.dataframe(delta_price_summary['pivot_table'], use_container_width=True)
-            else:
-                st.error(f"The overall Delta Price is {delta_price_summary['overall_delta_pct']:.2f}%. Please review the pricing strategy.", icon="🚨")
-                if show_dataframe: st.dataframe(delta_price_summary['pivot_table'], use_container_width=True)
+def main():
+    if st.session_state['authenticated']:
+        # ------------------------------- Menu -------------------------------
+        menu = option_menu(menu_title=None, menu_icon=None, orientation="horizontal", options=list(PAGES))
+        page = PAGES[menu]
 
-            # Highlighting the highest and lowest Delta Price
-            st.info(f"Highest Delta Price: {delta_price_summary['highest_delta_pct']:.2f}% in {delta_price_summary['highest_channel']} ({delta_price_summary['highest_sub_channel']}), by customer {delta_price_summary['highest_customer']}.", icon="🔼")
-            st.info(f"Lowest Delta Price: {delta_price_summary['lowest_delta_pct']:.2f}% in {delta_price_summary['lowest_channel']} ({delta_price_summary['lowest_sub_channel']}), by customer {delta_price_summary['lowest_customer']}. This requires immediate attention.", icon="🔽")
+        # Precompute the other pages' default views in the background so tab switches are instant; pages already warm
+        # for the current data return straight away (see plots.parallel.schedule_warm_up)
+        from plots.parallel import schedule_warm_up
+        schedule_warm_up(PAGES, active=menu)
 
-            delta_volume_threshold = st.sidebar.number_input("Delta Volume %", min_value=0, max_value=100, value=1, step=1)
-            delta_volume_summary = get_notification_delta(delta_df_filtered, 'Delta Volume %')
+        # ------------------------------- Data Fetching -------------------------------
+        # The page fragment reports the profile, fetching included (admins see it in the sidebar)
+        upload = get_upload()
+        with profile():
+            datasets = [get_source(name, upload) for name in page["datasets"]]
 
-            # Notifications for Delta Volume
-            if delta_volume_summary['overall_delta_pct'] < delta_volume_threshold:  # Assuming 1% is the minimum acceptable Delta Volume
-                st.error(f"The overall Delta Volume is {delta_volume_summary['overall_delta_pct']:.2f}% which is below your yearly target. This is concerning and needs a deep dive.", icon="🚨")
-                if show_dataframe: st.dataframe(delta_volume_summary['pivot_table'], use_container_width=True)
+            if "render" in page:
+                page["render"](*datasets)
             else:
-                st.success(f"The overall Delta Volume is {delta_volume_summary['overall_delta_pct']:.2f}%, which is above your yearly target. Excellent performance!", icon="☺")
-                if show_dataframe: st.dataframe(delta_volume_summary['pivot_table'], use_container_width=True)
-
-            # Highlighting the highest and lowest Delta Volume
-            st.info(f"Highest Delta Volume: {delta_volume_summary['highest_delta_pct']:.2f}% in {delta_volume_summary['highest_channel']} ({delta_volume_summary['highest_sub_channel']}), by customer {delta_volume_summary['highest_customer']}.", icon="🔼")
-            st.info(f"Lowest Delta Volume: {delta_volume_summary['lowest_delta_pct']:.2f}% in {delta_volume_summary['lowest_channel']} ({delta_volume_summary['lowest_sub_channel']}), by customer {delta_volume_summary['lowest_customer']}. Critical review required.", icon="🔽")
-
-
-            # ------------------------------- Quick Analysis -------------------------------
-            row_0 = st.columns(2)
-            row_0[0].plotly_chart(top_10_customers(df_year_2), use_container_width=True)
-            row_0[1].plotly_chart(top_10_products(df_year_2), use_container_width=True)
-
-            row_1 = st.columns(2)
-            row_1[0].plotly_chart(delta_qty_wrt_channel_category(delta_df_filtered), use_container_width=True)
-            row_1[1].plotly_chart(delta_qty_wrt_product_category(delta_df_filtered), use_container_width=True)
-
-            st.plotly_chart(rev_wrt_year_channel_n_product_category(delta_df_filtered), use_container_width=True)
-
-            # ------------------------------- End Overview -------------------------------
-
-        if menu == "Price Analysis":
-            # ------------------------------- Filters -------------------------------
-            df_filtered = get_price_filters(df)
-
-
-            # ------------------------------- KPIs -------------------------------
-            kpi_row = st.columns(4)
-            kpi_row[0].plotly_chart(sales_revenue_card(df_filtered), use_container_width=True)
-            kpi_row[1].plotly_chart(units_sold_card(df_filtered), use_container_width=True)
-            kpi_row[2].plotly_chart(profit_margin_card(df_filtered), use_container_width=True)
-            kpi_row[3].plotly_chart(average_discount_rate_card(df_filtered), use_container_width=True)
-
-            kpi_row1 = st.columns(3)
-            kpi_row1[0].plotly_chart(average_selling_price_card(df_filtered), use_container_width=True)
-            kpi_row1[1].plotly_chart(list_price_sales_card(df_filtered), use_container_width=True)
-            kpi_row1[2].plotly_chart(net_sales_card(df_filtered), use_container_width=True)
-
-
-            # ------------------------------- Income & Discounts Analysis -------------------------------
-            st.plotly_chart(unit_sold_wrt_campaign(df_filtered), use_container_width=True)
-            st.plotly_chart(discount_evo(df_filtered), use_container_width=True)
-
-            # ------------------------------- End Income & Expenses -------------------------------
-
-        if menu == "Customer Insights":
-            # ------------------------------- Filters -------------------------------
-            df_filtered = get_customer_filters(df)
-
-
-            # ------------------------------- Product Sales Analysis -------------------------------
-            st.plotly_chart(avg_unit_prc(df_filtered), use_container_width=True)
-            st.plotly_chart(avg_unit_prc_per_customer(df_filtered), use_container_width=True)
-
-            # ------------------------------- End Customer Insights -------------------------------
-
-        if menu == "Product Performance":
-            # ------------------------------- Filters -------------------------------
-            df_filtered = get_product_filters(df)
-
-
-            # ------------------------------- KPIs -------------------------------
-            kpi_row = st.columns(4)
-            kpi_row[0].plotly_chart(average_list_price_card(df_filtered), use_container_width=True)
-            kpi_row[1].plotly_chart(total_prod_qty_card(df_filtered), use_container_width=True)
-            kpi_row[2].plotly_chart(total_prod_rev_card(df_filtered), use_container_width=True)
-            kpi_row[3].plotly_chart(total_prod_GM_card(df_filtered), use_container_width=True)
-
-
-            # ------------------------------- Product Sales Analysis -------------------------------
-            row_1 = st.columns(2)
-            row_1[0].plotly_chart(monthly_rev_gm(df_filtered), use_container_width=True)
-            row_1[1].plotly_chart(product_performance(df_filtered), use_container_width=True)
-
-            row_2 = st.columns(2)
-            row_2[0].plotly_chart(customer_distribution(df_filtered), use_container_width=True)
-            row_2[1].plotly_chart(channel_distribution(df_filtered), use_container_width=True)
-
-            # ------------------------------- End Product Performance -------------------------------
-
-        if menu == "Summary Charts":
-            # ------------------------------- Filters -------------------------------
-            df_filtered = get_summary_filters(delta_df)
-
-
-            # ------------------------------- KPIs -------------------------------
-            kpi_row = st.columns(5)
-            kpi_row[0].plotly_chart(summary_rev_sum_card(df_filtered), use_container_width=True)
-            kpi_row[1].plotly_chart(summary_delta_price_sum_card(df_filtered), use_container_width=True)
-            kpi_row[2].plotly_chart(summary_delta_price_perct_card(df_filtered), use_container_width=True)
-            kpi_row[3].plotly_chart(summary_delta_volume_sum_card(df_filtered), use_container_width=True)
-            kpi_row[4].plotly_chart(summary_delta_volume_perct_card(df_filtered), use_container_width=True)
-
-
-            # ------------------------------- Revenue and Change Analysis -------------------------------
-            row_1 = st.columns(2)
-            row_1[0].plotly_chart(delta_qty_wrt_channel_category(df_filtered), use_container_width=True)
-            row_1[1].plotly_chart(rev_sum_wrt_channel_category(df_filtered), use_container_width=True)
-
-            st.plotly_chart(rev_wrt_channel_category_and_prod_family(df_filtered), use_container_width=True)
-
-            # ------------------------------- End Summary Charts -------------------------------
+                render_chart_page(menu, page, *datasets)
 
     elif st.session_state['authenticated'] == None:
         st.info("Login to view data insights", icon="🚨")
@@ -0,0 +1,240 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Compute backends for the filter cascades and the Overview. A query is a dataset plus a chain of equality / isin
+# conditions; it is only evaluated when asked for a column's distinct values, its row count, a grouped aggregate or its
+# rows, so filters and groupbys run inside the engine and only their (small) results come back as pandas frames.
+#   pandas  the frame fetched from MongoDB (default)
+#   star    the same data split into integer-coded facts and dimension tables (see star.py)
+#   polars  a lazy scan of the dataset's Parquet snapshot
+#   duckdb  SQL over the dataset's Parquet snapshot
+#   mongo   aggregation pipelines on the MongoDB collection itself, so only the matching documents are downloaded
+# Polars and DuckDB are optional dependencies, imported only when their backend is selected (DATA_BACKEND).
+# rows(columns) returns at least `columns` (every column when None): the backends that read the rows out of their
+# engine (polars, duckdb, mongo) fetch only those, while pandas and star hand back the rows they already hold.
+# Every backend returns distinct values in order of first appearance and aggregates sorted by their keys, like pandas'
+# unique() and groupby(), so widget defaults and tables don't depend on the backend.
+
+
+BACKENDS = ("pandas", "star", "polars", "duckdb", "mongo")
+
+
+def as_query(source):
+    """Wrap a pandas frame in a query without a data key (never pass it to a keyed cache); queries pass through."""
+    return PandasQuery(source, None) if isinstance(source, pd.DataFrame) else source
+
+def snapshot_path(name):
+    return os.path.join(os.environ.get("SNAPSHOT_DIR", "snapshots"), f"{name}.parquet")
+
+def scan_snapshot(backend, name):
+    """A query over the Parquet snapshot of dataset `name`, for the "polars" or "duckdb" backend."""
+    path = snapshot_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found: write it with `python backends.py {name}`")
+    key = (path, os.stat(path).st_mtime_ns)  # a rewritten snapshot gets new cache keys
+    if backend == "polars":
+        import polars as pl
+        return PolarsQuery(pl.scan_parquet(path), key)
+    if backend == "duckdb":
+        return DuckDBQuery(path, key)
+    raise ValueError(f"unknown DATA_BACKEND {backend!r}, expected one of {BACKENDS}")
+
+def scan_shared(name, version, generation):
+    """A polars query over version `version` of dataset `name` in the shared store (see shared_store.py)."""
+    import polars as pl
+    import shared_store
+    return PolarsQuery(pl.scan_ipc(shared_store.version_path(name, version)), (name, version, generation))
+
+def write_snapshot(df, name):
+    """Write `df` as the Parquet snapshot of dataset `name`, atomically (readers see the old or the new file)."""
+    path = snapshot_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+
+
+# ------------------------------- PANDAS -------------------------------
+class PandasQuery:
+    def __init__(self, df, key, mask=None):
+        self.df = df
+        self.key = key
+        self.mask = mask
+        self._rows = None
+
+    def where(self, column, value):
+        """Keep the rows where `column` equals `value`, or is in `value` if it is a tuple."""
+        condition = self.df[column].isin(value) if isinstance(value, tuple) else self.df[column] == value
+        return PandasQuery(self.df, self.key, condition if self.mask is None else self.mask & condition)
+
+    def distinct(self, column):
+        return (self.df[column] if self.mask is None else self.df.loc[self.mask, column]).unique()
+
+    def count(self):
+        return len(self.df) if self.mask is None else int(self.mask.sum())
+
+    def aggregate(self, by, aggregations):
+        """Group by the `by` columns and reduce each column of `aggregations` ({column: "sum" or "mean"})."""
+        grouped = self.rows().groupby(by, sort=True, observed=True)
+        return grouped.agg(**{column: (column, func) for column, func in aggregations.items()}).reset_index()
+
+    def rows(self, columns=None):
+        """The matching rows; the shared frame itself when there are no conditions."""
+        if self.mask is None:
+            return self.df
+        if self._rows is None:
+            self._rows = self.df[self.mask]
+        return self._rows
+
+
+# ------------------------------- POLARS -------------------------------
+class PolarsQuery:
+    def __init__(self, frame, key):
+        self.frame = frame  # polars.LazyFrame
+        self.key = key
+
+    def where(self, column, value):
+        import polars as pl
+        condition = pl.col(column).is_in(list(value)) if isinstance(value, tuple) else pl.col(column) == value
+        return PolarsQuery(self.frame.filter(condition), self.key)
+
+    def distinct(self, column):
+        import polars as pl
+        return self.frame.select(pl.col(column).unique(maintain_order=True)).collect().to_series().to_numpy()
+
+    def count(self):
+        import polars as pl
+        return self.frame.select(pl.len()).collect().item()
+
+    def aggregate(self, by, aggregations):
+        import polars as pl
+        reductions = [getattr(pl.col(column), func)().alias(column) for column, func in aggregations.items()]
+        result = self.frame.drop_nulls(by).group_by(by).agg(reductions).sort(by).collect()
+        return result.select(by + list(aggregations)).to_pandas()
+
+    def rows(self, columns=None):
+        frame = self.frame if columns is None else self.frame.select(columns)
+        return frame.collect().to_pandas()
+
+
+# ------------------------------- DUCKDB -------------------------------
+_duckdb_connection = None
+
+def duckdb_cursor():
+    """A cursor on the process' in-memory DuckDB database; each query gets its own, so threads don't share one."""
+    global _duckdb_connection
+    import duckdb
+    if _duckdb_connection is None:
+        _duckdb_connection = duckdb.connect()
+    return _duckdb_connection.cursor()
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+class DuckDBQuery:
+    def __init__(self, path, key, conditions=(), parameters=()):
+        self.path = path
+        self.key = key
+        self.conditions = conditions
+        self.parameters = parameters
+
+    def where(self, column, value):
+        if isinstance(value, tuple):
+            if not value:
+                return DuckDBQuery(self.path, self.key, self.conditions + ("false",), self.parameters)
+            condition = f"{quote(column)} IN ({', '.join('?' * len(value))})"
+            return DuckDBQuery(self.path, self.key, self.conditions + (condition,), self.parameters + value)
+        return DuckDBQuery(self.path, self.key, self.conditions + (f"{quote(column)} = ?",), self.parameters + (value,))
+
+    def execute(self, select, tail="", conditions=()):
+        """Run `SELECT select FROM <snapshot> WHERE <conditions> tail` and return the result as a pandas frame."""
+        source = "read_parquet('{}', file_row_number = true)".format(self.path.replace("'", "''"))
+        where = " AND ".join(self.conditions + tuple(conditions)) or "true"
+        return duckdb_cursor().execute(f"SELECT {select} FROM {source} WHERE {where} {tail}", self.parameters).df()
+
+    def distinct(self, column):
+        first_seen = self.execute(quote(column), f"GROUP BY {quote(column)} ORDER BY min(file_row_number)")
+        return first_seen[column].to_numpy()
+
+    def count(self):
+        return int(self.execute("count(*) AS n")["n"].iloc[0])
+
+    def aggregate(self, by, aggregations):
+        keys = ", ".join(quote(column) for column in by)
+        # pandas sums an empty (all-null) group to 0; SQL to NULL
+        reductions = ", ".join(
+            (f"coalesce(sum({quote(column)}), 0)" if func == "sum" else f"{func}({quote(column)})") + f" AS {quote(column)}"
+            for column, func in aggregations.items())
+        return self.execute(f"{keys}, {reductions}", f"GROUP BY {keys} ORDER BY {keys}",
+                            [f"{quote(column)} IS NOT NULL" for column in by])
+
+    def rows(self, columns=None):
+        select = "* EXCLUDE (file_row_number)" if columns is None else ", ".join(quote(column) for column in columns)
+        return self.execute(select, "ORDER BY file_row_number")
+
+
+# ------------------------------- MONGO -------------------------------
+class MongoQuery:
+    """
+    A query on a MongoDB collection: the conditions become a `$match` stage, which the compound indexes of
+    utils.INDEXES serve, and every question is one aggregation pipeline run through `run(name, pipeline)` (a cached
+    function returning the documents as a frame, see utils.run_pipeline).
+    """
+    def __init__(self, name, key, run, conditions=()):
+        self.name = name
+        self.key = key
+        self.run = run
+        self.conditions = conditions
+
+    def where(self, column, value):
+        condition = {column: {"$in": list(value)} if isinstance(value, tuple) else value}
+        return MongoQuery(self.name, self.key, self.run, self.conditions + (condition,))
+
+    def match(self):
+        """The `find` filter of the conditions."""
+        if len(self.conditions) < 2:
+            return self.conditions[0] if self.conditions else {}
+        return {"$and": list(self.conditions)}
+
+    def execute(self, *stages):
+        return self.run(self.name, [{"$match": self.match()}, *stages])
+
+    def distinct(self, column):
+        # _id grows with insertion, the order the full collection is read in
+        first_seen = self.execute({"$group": {"_id": f"${column}", "first": {"$min": "$_id"}}}, {"$sort": {"first": 1}})
+        return first_seen["_id"].to_numpy() if len(first_seen) else np.array([], dtype=object)
+
+    def count(self):
+        result = self.execute({"$count": "n"})
+        return int(result["n"].iloc[0]) if len(result) else 0
+
+    def aggregate(self, by, aggregations):
+        # Field names are positional: Mongo reserves "." and "$" in output names
+        keys = {f"k{position}": f"${column}" for position, column in enumerate(by)}
+        reductions = {f"v{position}": {"$sum" if func == "sum" else "$avg": f"${column}"}
+                      for position, (column, func) in enumerate(aggregations.items())}
+        result = self.execute({"$match": {column: {"$ne": None} for column in by}},
+                              {"$group": {"_id": keys, **reductions}})
+        columns = list(by) + list(aggregations)
+        if not len(result):
+            return pd.DataFrame(columns=columns)
+        result = pd.concat([pd.DataFrame(list(result["_id"])), result[list(reductions)]], axis=1)
+        result.columns = columns
+        return result.sort_values(list(by)).reset_index(drop=True)
+
+    def rows(self, columns=None):
+        projection = {"_id": 0, **dict.fromkeys(columns or [], 1)}  # a find() projection of just those fields
+        rows = self.execute({"$sort": {"_id": 1}}, {"$project": projection})
+        if not len(rows):  # keep the columns, so the chart builders see an empty frame of the right shape
+            rows = pd.DataFrame(columns=columns or self.run(self.name, [{"$limit": 1}, {"$project": projection}]).columns)
+        return rows
+
+
+if __name__ == "__main__":
+    # python backends.py users delta: snapshot the MongoDB collections for the polars and duckdb backends
+    from utils import fetch_data
+    for name in sys.argv[1:] or ["users", "delta"]:
+        write_snapshot(fetch_data(name), name)
+        print(f"wrote {snapshot_path(name)}")
@@ -0,0 +1,243 @@
+"""
+Offline benchmark suite for the filter cascades, the Overview notifications and every plots/plots.py builder.
+
+Each function runs on synthetic user_data/delta_data (see bench/synthetic.py) at every requested size, without
+Mongo or a Streamlit server (widgets resolve to their defaults in bare mode). Time is the best of `--repeat` runs;
+peak memory is measured separately with tracemalloc so it doesn't skew the timings. Every plots builder also asserts
+that it left the frozen frame's columns as they were, plots.COLUMNS that the columns listed per builder are all it
+reads, and star.parity that the "star" backend returns the same filter cascades and aggregates as "pandas"; any
+failing function exits with status 1.
+
+    python bench/benchmarks.py --sizes 10000 100000 1000000 10000000 --json bench_results.json
+    python bench/benchmarks.py --baseline bench_results.json   # flags functions slower than the saved run
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alerts
+import anomalies
+import elasticity
+import periods
+import pvm
+import rankings
+import star
+import utils
+import waterfall
+import whatif
+from plots import plots
+from bench.synthetic import YEARS, generate_delta_data, generate_user_data
+
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Builders that read delta_data; every other builder in plots/plots.py reads user_data
+DELTA_BUILDERS = {
+    "summary_rev_sum_card", "summary_delta_price_sum_card", "summary_delta_price_perct_card",
+    "summary_delta_volume_sum_card", "summary_delta_volume_perct_card", "delta_qty_wrt_channel_category",
+    "delta_qty_wrt_product_category", "rev_sum_wrt_channel_category", "rev_wrt_channel_category_and_prod_family",
+    "rev_wrt_year_channel_n_product_category",
+}
+# Builders that draw a ranking frame (see rankings.top_n) rather than a dataset
+RANKING_BUILDERS = {"top_n_bar"}
+
+
+def narrow_choice(step, options):
+    """A filter choice past the defaults: every selectbox's second option and every multiselect's first two."""
+    if step["widget"] == "multiselect":
+        return options[:2]
+    return options[min(1, len(options) - 1)] if len(options) else None
+
+def backend_results(users, delta):
+    """{name: frame or selection} of the filter cascades, the Overview's filters and page aggregates on two queries."""
+    results = {}
+    for name, steps, source in [("price", utils.PRICE_FILTERS, users), ("customer", utils.CUSTOMER_FILTERS, users),
+                                ("product", utils.PRODUCT_FILTERS, users), ("summary", utils.SUMMARY_FILTERS, delta)]:
+        for choose in (utils.default_choice, narrow_choice):
+            rows, selection = utils.apply_filters(source, steps, choose)
+            results[f"{name} {choose.__name__} rows"], results[f"{name} {choose.__name__} selection"] = rows, selection
+    *queries, selection = utils.get_notification_filters(users, delta)
+    results.update({f"overview rows {position}": query.rows() for position, query in enumerate(queries)})
+    results["overview selection"] = selection
+    results["delta aggregate"] = delta.aggregate(by=list(utils.NOTIFICATION_KEYS),
+                                                 aggregations={"Delta Price %": "mean", "Delta Price [CAD]": "sum"})
+    results["users aggregate"] = users.aggregate(by=["YEAR", "MONTH", "Product Range"], aggregations={"Revenue": "sum"})
+    return results
+
+def check_star_parity(df, delta_df):
+    """Build the star schemas and assert the "star" backend returns what "pandas" does for every backend_results."""
+    import pandas as pd
+    from backends import PandasQuery
+    expected = backend_results(PandasQuery(df, "users"), PandasQuery(delta_df, "delta"))
+    actual = backend_results(star.StarQuery(star.build_star(df), "users"),
+                             star.StarQuery(star.build_star(delta_df), "delta"))
+    for name, value in expected.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(actual[name], value, check_dtype=False, obj=f"star {name}")
+        else:
+            assert actual[name] == value, f"star {name}: {actual[name]!r}, pandas {value!r}"
+
+
+def frame_fingerprint(df):
+    """Each column of a frame with the address of its values: adding, dropping or replacing a column changes it."""
+    return [(column, df[column].to_numpy().__array_interface__["data"][0]) for column in df.columns]
+
+def check_unchanged(builder, frame):
+    """
+    Run a builder on a shared (frozen) frame and assert it left the frame's columns alone: freeze_frame blocks writes
+    into the values, not a builder assigning a column such as df["Weighted X"] = ... on the cached frame.
+    """
+    before = frame_fingerprint(frame)
+    builder(frame)
+    assert frame_fingerprint(frame) == before, f"{builder.__name__} added or replaced columns of the shared frame"
+
+def check_columns(df):
+    """
+    Assert every builder listed in plots.COLUMNS draws the same figure from just those columns as from the whole frame,
+    also with every fifth value of the float columns missing (a missing discount amount falls back to its rate).
+    """
+    import numpy as np
+    holed = df.copy()
+    for column in holed.columns[holed.dtypes == float]:
+        holed.loc[holed.index[::5], column] = np.nan
+    for name, columns in plots.COLUMNS.items():
+        builder = getattr(plots, name)
+        for frame in (df, holed):
+            assert builder(frame[columns]).to_json() == builder(frame).to_json(), f"plots.COLUMNS[{name!r}] is incomplete"
+
+
+def benchmark_cases(df, delta_df):
+    """Return {name: zero-argument callable} for every function under benchmark."""
+    # Latest year first, so the Year selectbox defaults to a year that has a prior year to compare with
+    df_latest_first = df.sort_values("YEAR", ascending=False, kind="stable")
+    period_index = periods.build_index(df)
+    delta_rollup = utils.get_delta_rollup(delta_df)
+    cases = {
+        "utils.get_notification_filters": lambda: [query.rows() for query in utils.get_notification_filters(df_latest_first, delta_df)[:3]],
+        "utils.get_price_filters": lambda: utils.get_price_filters(df),
+        "utils.get_customer_filters": lambda: utils.get_customer_filters(df),
+        "utils.get_product_filters": lambda: utils.get_product_filters(df),
+        "utils.get_summary_filters": lambda: utils.get_summary_filters(delta_df),
+        "periods.build_index": lambda: periods.build_index(df),
+        "utils.get_notification_revenue_growth": lambda: utils.get_notification_revenue_growth(period_index, YEARS[1], "Jun"),
+        "utils.get_delta_rollup": lambda: utils.get_delta_rollup(delta_df),
+        "utils.get_notification_delta[price]": lambda: utils.get_notification_delta(delta_rollup, 'Delta Price %'),
+        "utils.get_notification_delta[volume]": lambda: utils.get_notification_delta(delta_rollup, 'Delta Volume %'),
+        "pvm.rollup[all levels]": lambda: pvm.rollup(delta_df),
+        "anomalies.score_cells": lambda: anomalies.score_cells(anomalies.cell_deltas(delta_df)),
+        "alerts.segment_metrics+evaluate": lambda: alerts.evaluate(alerts.segment_metrics(df, delta_df)[0], alerts.RULES),
+        "rankings.build_index": lambda: rankings.build_index(df),
+        "plots.COLUMNS[complete]": lambda: check_columns(df),
+        "star.parity[cascades+aggregates]": lambda: check_star_parity(df_latest_first.reset_index(drop=True), delta_df),
+        "waterfall.waterfall[SKU x customer]": lambda: waterfall.waterfall(df, ["Product SKU", "Customer Name"]),
+        "waterfall.leakage_ranking[customer]": lambda: waterfall.leakage_ranking(df, "Customer Name"),
+    }
+    for level in elasticity.LEVELS:
+        cases[f"elasticity.fit[{level}]"] = lambda level=level: elasticity.fit(
+            elasticity.monthly_points(df, elasticity.LEVELS[level]), elasticity.LEVELS[level])
+    base = whatif.build_base(df)
+    categories, channels = base["labels"]["Product Category"], base["labels"]["Channel Category"]
+    cases["whatif.build_base"] = lambda: whatif.build_base(df)
+    cases["whatif.simulate+monthly"] = lambda: whatif.monthly(base, whatif.simulate(
+        base, {categories[0]: 0.05}, {channels[0]: 0.02}, -1.2))
+    index = rankings.build_index(df)
+    months = ("Jan", "Feb", "Mar")
+    cases["rankings.top_n[revenue]"] = lambda: rankings.top_n(index, "Customer Name", YEARS[1], months, 10, "Revenue")
+    cases["rankings.top_n[delta]"] = lambda: rankings.top_n(index, "Product Range", YEARS[1], months, 10, "Delta")
+    cases["plots.top_n_bar"] = lambda: plots.top_n_bar(rankings.top_n(index, "Product Range", YEARS[1], months, 10, "Revenue"), "Top 10")
+    for name, builder in inspect.getmembers(plots, inspect.isfunction):
+        if builder.__module__ == plots.__name__ and name not in RANKING_BUILDERS:
+            frame = delta_df if name in DELTA_BUILDERS else df
+            cases[f"plots.{name}"] = lambda builder=builder, frame=frame: check_unchanged(builder, frame)
+    return cases
+
+
+def measure(func, repeat):
+    """Return (best wall time in s, peak traced memory in MB) for func()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1e6
+
+
+def run(sizes, repeat, only=None):
+    """Benchmark every case at every size and return a list of result records."""
+    results = []
+    for size in sizes:
+        df = generate_user_data(size)
+        delta_df = generate_delta_data(df)
+        # benchmark the frames the app actually shares: read-only
+        df, delta_df = utils.freeze_frame(df), utils.freeze_frame(delta_df)
+        print(f"\n{len(df):,} user_data rows / {len(delta_df):,} delta_data rows")
+        for name, func in benchmark_cases(df, delta_df).items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):  # some builders print their intermediate frames
+                    seconds, peak_mb = measure(func, repeat)
+            except Exception as error:
+                print(f"  {name:<52} error: {error!r}")
+                results.append({"function": name, "rows": size, "error": repr(error)})
+                continue
+            print(f"  {name:<52} {seconds * 1000:10.1f} ms {peak_mb:10.1f} MB")
+            results.append({"function": name, "rows": size, "seconds": seconds, "peak_mb": peak_mb})
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Print every function that got slower than the baseline run by more than `tolerance` (a ratio)."""
+    with open(baseline_path) as baseline_file:
+        baseline = {(r["function"], r["rows"]): r for r in json.load(baseline_file) if "seconds" in r}
+    regressions = 0
+    for result in results:
+        previous = baseline.get((result["function"], result["rows"]))
+        if previous and "seconds" in result and result["seconds"] > previous["seconds"] * tolerance:
+            regressions += 1
+            print(f"REGRESSION {result['function']} @ {result['rows']:,} rows: "
+                  f"{previous['seconds'] * 1000:.1f} ms -> {result['seconds'] * 1000:.1f} ms")
+    print(f"\n{regressions} regression(s) against {baseline_path}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="user_data row counts")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per function (best is reported)")
+    parser.add_argument("--only", nargs="+", help="only run functions whose name contains one of these")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results previously written with --json")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    # Bare-mode widgets log a "missing ScriptRunContext" warning on every call, and Streamlit resets its loggers'
+    # levels when its config loads, so mute warnings process-wide instead
+    logging.disable(logging.WARNING)
+    results = run(args.sizes, args.repeat, args.only)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+    errors = sum("error" in result for result in results)  # e.g. the star backend no longer matching pandas
+    if errors:
+        print(f"\n{errors} function(s) failed")
+    regressions = compare(results, args.baseline, args.tolerance) if args.baseline else 0
+    sys.exit(1 if errors or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Import-time profile of the dashboard.
+
+Runs `python -X importtime` in fresh interpreters for the modules loaded before the login sidebar draws and for
+the modules a page adds once it renders, and prints the median total plus the heaviest top-level imports.
+
+    python bench/import_profile.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    "streamlit": ["streamlit"],
+    "login screen": ["streamlit", "streamlit_option_menu", "utils"],
+    "first page": ["streamlit", "streamlit_option_menu", "utils", "pandas", "plots.plots"],
+}
+
+
+def import_times(modules):
+    """Import the modules in a clean interpreter and return the cumulative time in ms of each top-level import."""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):  # nested imports are indented under their parent
+            timings[name.strip()] = int(cumulative) / 1000
+    return timings
+
+
+def profile(modules, repeat):
+    """Return the median total import time in ms and the per-module timings of the median run."""
+    runs = sorted((import_times(modules) for _ in range(repeat)), key=lambda timings: sum(timings.values()))
+    median_run = runs[len(runs) // 2]
+    return statistics.median(sum(run.values()) for run in runs), median_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per profile (median is reported)")
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list per profile")
+    args = parser.parse_args()
+
+    for label, modules in PROFILES.items():
+        total, timings = profile(modules, args.repeat)
+        print(f"{label:<14} {total:8.1f} ms")
+        for name, ms in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"    {name:<40} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Concurrent-session load test.
+
+Drives N simulated analysts through the app in one process (as one Streamlit worker serves them), each with its own
+AppTest session: log in, then a random mix of menu switches and sidebar filter changes. MongoDB is replaced by
+in-memory collections built from synthetic data (bench/synthetic.py) or from snapshot files (`users` and `delta` as
+.parquet or .csv in --snapshot). Reports throughput, latency percentiles per action and page, and memory per session:
+the peak RSS while the sessions are live, less the RSS before they start. A session the harness can't drive counts
+as one "crash" error and the other sessions carry on.
+
+    python bench/load_test.py --sessions 1 4 16 --actions 20 --rows 100000
+    python bench/load_test.py --sessions 8 --snapshot snapshots/ --json load.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit_option_menu
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, app_test
+from streamlit.testing.v1.util import build_mock_config_get_option
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils
+from bench.synthetic import generate_delta_data, generate_user_data
+
+
+APP = os.path.join(ROOT, "app.py")
+PASSWORD = "load-test"
+
+
+def app_pages():
+    """The menu of app.PAGES, read from its source: importing app.py would run the app."""
+    import ast
+    with open(APP) as file:
+        tree = ast.parse(file.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "PAGES" for target in node.targets):
+            return [ast.literal_eval(key) for key in node.value.keys]
+    raise RuntimeError(f"no PAGES in {APP}")
+
+PAGES = app_pages()
+
+
+# ------------------------------- MONGO STAND-IN -------------------------------
+class SnapshotCollection:
+    """Stands in for a pymongo collection over a frame: find() returns its rows as documents."""
+    def __init__(self, df):
+        self.df = df
+
+    def find(self, *args, **kwargs):
+        return self.df.assign(_id=np.arange(len(self.df))).to_dict("records")
+
+class AuthCollection:
+    """Accepts every user name with PASSWORD."""
+    def find_one(self, query):
+        return {"name": query.get("name"), "password": PASSWORD}
+
+def load_snapshot(directory, name):
+    for extension, read in [(".parquet", pd.read_parquet), (".csv", pd.read_csv)]:
+        path = os.path.join(directory, name + extension)
+        if os.path.exists(path):
+            return read(path)
+    raise FileNotFoundError(f"no {name}.parquet or {name}.csv in {directory}")
+
+def install_stand_ins(rows, snapshot=None):
+    """Route utils' Mongo access to in-memory collections and let each session pick its own menu option."""
+    if snapshot:
+        users, delta = load_snapshot(snapshot, "users"), load_snapshot(snapshot, "delta")
+    else:
+        users = generate_user_data(rows)
+        delta = generate_delta_data(users)
+    collections = {"users": SnapshotCollection(users), "delta": SnapshotCollection(delta), "auth_user": AuthCollection()}
+    utils.get_mongo_collection = collections.__getitem__
+    # The option menu is a custom component AppTest can't click: read the page from the session instead
+    streamlit_option_menu.option_menu = lambda options, **kwargs: st.session_state.get("load_test_page", options[0])
+    share_runtime()
+    return len(users), len(delta)
+
+def share_runtime():
+    """
+    AppTest installs a mock Runtime singleton for each run and removes it when the run ends, which breaks the other
+    sessions' runs still in flight. Keep the latest mock in place instead, as a server keeps its one Runtime.
+    """
+    latest = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest[:] = [cls._instance]
+        if not latest:
+            raise RuntimeError("Runtime hasn't been created!")
+        return latest[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(latest))
+
+    # Each run also patches config.get_option for its duration to report global.appTest. Overlapping patches unwind
+    # out of order: a run ending restores the real get_option under a run still in flight, whose widgets then skip
+    # registering their test state and its next run fails with KeyError('$$ID-...'). Set the option once instead.
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+    # AppTest compiles the script afresh on every run, and concurrent ast.parse() calls can fail on some CPython 3.11
+    # releases ("AST constructor recursion depth mismatch")
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = locked_get_bytecode
+
+
+# ------------------------------- SESSIONS -------------------------------
+def timed_run(at, results, session, action):
+    """Rerun the session's script and record the latency of the action that triggered it."""
+    start = time.perf_counter()
+    at.run()
+    results.append({
+        "session": session, "action": action, "page": at.session_state["load_test_page"],
+        "seconds": time.perf_counter() - start,
+        "error": at.exception[0].value if len(at.exception) else None,
+    })
+
+def change_filter(at, rng):
+    """Pick one sidebar filter and give it a random selection; returns False if the page has none."""
+    widgets = [*at.sidebar.selectbox, *at.sidebar.multiselect]
+    widgets = [widget for widget in widgets if widget.options]
+    if not widgets:
+        return False
+    widget = rng.choice(widgets)
+    if widget.type == "multiselect":
+        widget.set_value(rng.sample(widget.options, rng.randint(0, min(3, len(widget.options)))))
+    else:
+        widget.select_index(rng.randrange(len(widget.options)))
+    return True
+
+def run_session(session, actions, switch_probability, think, seed, results, timeout):
+    """One analyst: log in on the Overview, then `actions` menu switches or filter changes."""
+    rng = random.Random(seed + session)
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.session_state["load_test_page"] = "Overview"
+    timed_run(at, results, session, "open")
+    at.sidebar.text_input[0].input(f"analyst-{session}")
+    at.sidebar.text_input[1].input(PASSWORD)
+    at.sidebar.button[0].click()
+    timed_run(at, results, session, "login")
+    for _ in range(actions):
+        time.sleep(rng.uniform(0, think))
+        if rng.random() < switch_probability or not change_filter(at, rng):
+            at.session_state["load_test_page"] = rng.choice(PAGES)
+            action = "switch"
+        else:
+            action = "filter"
+        timed_run(at, results, session, action)
+    return at
+
+
+# ------------------------------- REPORT -------------------------------
+def rss_mb():
+    """Current resident set size of this process."""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def sample_peak_rss(stop, peak, interval=0.05):
+    """Keep the highest RSS seen in peak[0] until `stop` is set: session state is freed as soon as a session ends."""
+    while not stop.wait(interval):
+        peak[0] = max(peak[0], rss_mb())
+
+def percentiles(seconds):
+    p50, p90, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 90, 99])
+    return {"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "max_ms": max(seconds) * 1000}
+
+def load_test(sessions, actions, switch_probability, think, seed, timeout):
+    """Run `sessions` analysts concurrently and summarize their reruns."""
+    results = []
+    apps = [None] * sessions
+    rss_before = rss_mb()
+
+    def worker(session):
+        try:
+            apps[session] = run_session(session, actions, switch_probability, think, seed, results, timeout)
+        except Exception as error:  # a session the harness couldn't drive (e.g. the login form never drew)
+            results.append({"session": session, "action": "crash", "page": None, "seconds": 0.0, "error": repr(error)})
+
+    stop, peak = threading.Event(), [rss_before]
+    sampler = threading.Thread(target=sample_peak_rss, args=(stop, peak), name="rss-sampler", daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(session,), name=f"session-{session}") for session in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+
+    summary = {
+        "sessions": sessions, "reruns": len(results), "seconds": elapsed,
+        "reruns_per_second": len(results) / elapsed,
+        "errors": sum(result["error"] is not None for result in results),
+        "rss_mb": rss_mb(), "peak_rss_mb": peak[0], "mb_per_session": (peak[0] - rss_before) / sessions,
+        **percentiles([result["seconds"] for result in results]),
+        "by_action": {}, "by_page": {},
+    }
+    for key, group in [("action", "by_action"), ("page", "by_page")]:
+        for value in sorted({result[key] for result in results if result[key] is not None}):
+            summary[group][value] = percentiles([result["seconds"] for result in results if result[key] == value])
+    return summary, results
+
+def print_summary(summary):
+    print(f"\n{summary['sessions']} sessions: {summary['reruns']} reruns in {summary['seconds']:.1f} s "
+          f"({summary['reruns_per_second']:.2f}/s), {summary['errors']} errors, "
+          f"peak RSS {summary['peak_rss_mb']:.0f} MB ({summary['mb_per_session']:+.1f} MB/session)")
+    print(f"  {'':<22} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    rows = [("all", summary)] + list(summary["by_action"].items()) + list(summary["by_page"].items())
+    for label, stats in rows:
+        print(f"  {label:<22} " + " ".join(f"{stats[key]:7.0f}ms" for key in ["p50_ms", "p90_ms", "p99_ms", "max_ms"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="concurrent sessions, one run each")
+    parser.add_argument("--actions", type=int, default=20, help="menu switches / filter changes per session")
+    parser.add_argument("--switch", type=float, default=0.3, help="probability that an action is a menu switch")
+    parser.add_argument("--think", type=float, default=0.0, help="max random pause before each action, in seconds")
+    parser.add_argument("--rows", type=int, default=100_000, help="synthetic user_data rows")
+    parser.add_argument("--snapshot", help="directory with users/delta .parquet or .csv files instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds before a single rerun is failed")
+    parser.add_argument("--json", help="write the summaries (and every rerun) to this file")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # the app opens css/style.css relative to the working directory
+    logging.disable(logging.WARNING)  # bare-mode and deprecation warnings from every session
+    users_rows, delta_rows = install_stand_ins(args.rows, args.snapshot)
+    print(f"{users_rows:,} user_data rows / {delta_rows:,} delta_data rows")
+
+    # One untimed session first, so the shared data fetch isn't charged to the first run's latency and memory
+    with contextlib.redirect_stdout(io.StringIO()):  # some builders print their intermediate frames
+        load_test(1, 0, args.switch, 0, args.seed, args.timeout)
+    report = []
+    for sessions in args.sessions:
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary, results = load_test(sessions, args.actions, args.switch, args.think, args.seed, args.timeout)
+        print_summary(summary)
+        report.append({**summary, "reruns_detail": results})
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(report, output, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
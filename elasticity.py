@@ -0,0 +1,97 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from profiling import profiled, profiled_cache, submit
+
+# Price elasticity of demand for every series at once: the slope of log(quantity) on log(net price) over a series'
+# monthly points (one per customer and month), fitted by least squares. A simple regression's normal equations only
+# need six sums per series (n, Σx, Σy, Σx², Σxy, Σy²), so every series is fitted from one bincount per sum over
+# the grouped arrays, without a loop over series. The sums are additive: large inputs are split into row chunks
+# summed on a thread pool of their own (NumPy releases the GIL for the logs and products) and the partial sums added.
+
+
+# Series level -> the columns identifying a series
+LEVELS = {
+    "SKU": ["Product SKU"],
+    "SKU x Channel": ["Product SKU", "Channel Category"],
+}
+
+# Series with fewer points, or a single price, get no estimate
+MIN_POINTS = int(os.environ.get("ELASTICITY_MIN_POINTS", 6))
+
+# Rows per chunk when the sums are split across threads
+CHUNK_ROWS = int(os.environ.get("ELASTICITY_CHUNK_ROWS", 500_000))
+
+# Not the chart pool: a chart builder fitting a large frame would wait on workers of its own pool
+_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="elasticity")
+
+
+@profiled_cache(st.cache_resource, max_entries=8)
+def get_elasticities(data_key, level, _source):
+    """The elasticities of every series of `level` in a users source, cached on its key (see utils.get_source)."""
+    return fit(monthly_points(_source, LEVELS[level]), LEVELS[level])
+
+@profiled
+def monthly_points(source, keys):
+    """One point per series, customer and month of a users frame or query: summed revenue and quantity."""
+    from backends import as_query
+    by = ["YEAR", "MONTH", "Customer Code"] + [key for key in keys if key != "Customer Code"]
+    return as_query(source).aggregate(by=by, aggregations={"Revenue": "sum", "QTY [Units]": "sum"})
+
+def series_codes(points, keys):
+    """(row series codes, a frame of each code's keys): the keys are factorized one column at a time and combined."""
+    import numpy as np
+    import pandas as pd
+    codes, labels = np.zeros(len(points), dtype=np.int64), []
+    for key in keys:
+        key_codes, uniques = pd.factorize(points[key], use_na_sentinel=False)
+        codes, labels = codes * len(uniques) + key_codes, labels + [uniques]
+    codes, combined = pd.factorize(codes)
+    series = {}
+    for key, uniques in zip(reversed(keys), reversed(labels)):
+        combined, positions = np.divmod(combined, len(uniques))
+        series[key] = np.asarray(uniques, dtype=object)[positions]
+    return codes, pd.DataFrame({key: series[key] for key in keys})
+
+def partial_sums(codes, price, quantity, size):
+    """The six regression sums per series code over a chunk of points, skipping any without a positive price or QTY."""
+    import numpy as np
+    valid = (price > 0) & (quantity > 0)
+    codes = codes[valid]
+    x, y = np.log(price[valid]), np.log(quantity[valid])
+    return np.stack([np.bincount(codes, weights=weights, minlength=size)
+                     for weights in (np.ones_like(x), x, y, x * x, x * y, y * y)])
+
+@profiled
+def fit(points, keys):
+    """
+    Fit log(QTY) = intercept + elasticity x log(price) for each series of `keys` in a frame of points with Revenue and
+    QTY [Units]. Returns one row per series: its keys, Elasticity, Intercept, R², Std Error and Points.
+    """
+    import numpy as np
+    import pandas as pd
+    codes, series = series_codes(points, keys)
+    quantity = points["QTY [Units]"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price = points["Revenue"].to_numpy(dtype=float) / quantity
+    size, chunks = len(series), range(0, len(points), CHUNK_ROWS)
+    if len(chunks) > 1:
+        futures = [submit(_pool, partial_sums, codes[start:start + CHUNK_ROWS],
+                          price[start:start + CHUNK_ROWS], quantity[start:start + CHUNK_ROWS], size)
+                   for start in chunks]
+        n, sx, sy, sxx, sxy, syy = sum(future.result() for future in futures)
+    else:
+        n, sx, sy, sxx, sxy, syy = partial_sums(codes, price, quantity, size)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vxx, vxy, vyy = sxx - sx * sx / n, sxy - sx * sy / n, syy - sy * sy / n  # centered sums
+        fitted = (n >= MIN_POINTS) & (vxx > 1e-12 * np.maximum(sxx, 1))
+        slope = np.where(fitted, vxy / vxx, np.nan)
+        intercept = np.where(fitted, (sy - slope * sx) / n, np.nan)
+        residual = np.maximum(vyy - slope * vxy, 0)
+        r2 = np.where(fitted & (vyy > 0), 1 - residual / vyy, np.nan)
+        error = np.where(fitted & (n > 2), np.sqrt(residual / (n - 2) / vxx), np.nan)
+    return series.assign(**{"Elasticity": slope, "Intercept": intercept, "R²": r2, "Std Error": error,
+                            "Points": n.astype(int)})
@@ -0,0 +1,153 @@
+import bisect
+import http.server
+import logging
+import os
+import threading
+import time
+
+# Process-wide counters, gauges and histograms in the Prometheus text format, fed by every page profile (see
+# profiling.profile) and by fetch_data; the exporter serves them on METRICS_PORT (a local sidecar endpoint for
+# Prometheus to scrape) and/or rewrites METRICS_FILE every METRICS_INTERVAL seconds (for node_exporter's textfile
+# collector). Both are off unless their environment variable is set.
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; +Inf is implicit
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS = {
+    "aitionics_page_render_seconds": ("histogram", "Page render time, per menu option."),
+    "aitionics_mongo_fetch_seconds": ("histogram", "MongoDB find() and frame construction time, per collection."),
+    "aitionics_mongo_fetch_rows": ("gauge", "Rows returned by the last fetch, per collection."),
+    "aitionics_figure_build_seconds": ("histogram", "Figure build time, per plots/plots.py function."),
+    "aitionics_cache_requests_total": ("counter", "Cached calls, per function and result (hit or miss)."),
+    "aitionics_active_sessions": ("gauge", "Browser sessions currently connected."),
+}
+
+_lock = threading.Lock()
+_values = {}  # (metric, labels) -> value, or [bucket counts..., +Inf count, sum] for histograms
+_sessions = set()
+_exporter_started = False
+
+
+def increment(metric, labels, amount=1):
+    with _lock:
+        _values[metric, labels] = _values.get((metric, labels), 0) + amount
+
+def set_gauge(metric, labels, value):
+    with _lock:
+        _values[metric, labels] = value
+
+def observe(metric, labels, seconds):
+    with _lock:
+        counts = _values.setdefault((metric, labels), [0] * (len(BUCKETS) + 2))
+        counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        counts[-1] += seconds
+
+
+def observe_records(records):
+    """Fold a profile's figure builds and cache lookups into the metrics."""
+    for entry in records:
+        if "ms" not in entry:
+            continue
+        if entry["kind"] == "figure":
+            observe("aitionics_figure_build_seconds", (("function", entry["stage"]),), entry["ms"] / 1000)
+        elif entry["kind"] == "cache":
+            increment("aitionics_cache_requests_total", (("function", entry["stage"]), ("result", entry["cache"])))
+
+def observe_fetch(collection, seconds, rows):
+    observe("aitionics_mongo_fetch_seconds", (("collection", collection),), seconds)
+    set_gauge("aitionics_mongo_fetch_rows", (("collection", collection),), rows)
+
+def track_session():
+    """Count the current browser session as active until Streamlit reports it closed."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        with _lock:
+            _sessions.add(ctx.session_id)
+
+def active_sessions():
+    from streamlit import runtime
+    if not runtime.exists():
+        return len(_sessions)
+    instance = runtime.get_instance()
+    with _lock:
+        _sessions.intersection_update([session for session in _sessions if instance.is_active_session(session)])
+        return len(_sessions)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    set_gauge("aitionics_active_sessions", (), active_sessions())
+    with _lock:
+        values = {key: list(value) if isinstance(value, list) else value for key, value in _values.items()}
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for (name, labels), value in sorted(values.items()):
+            if name != metric:
+                continue
+            if kind != "histogram":
+                lines.append(f"{metric}{format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), value[:-1]):
+                cumulative += count
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {value[-1]}")
+            lines.append(f"{metric}_count{format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+# ------------------------------- EXPORTER -------------------------------
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serve render() on every GET path (Prometheus scrapes /metrics)."""
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def write_metrics_file(path):
+    """Rewrite `path` atomically, so a collector never reads a half-written file."""
+    with open(f"{path}.tmp", "w") as metrics_file:
+        metrics_file.write(render())
+    os.replace(f"{path}.tmp", path)
+
+def write_metrics_file_forever(path, interval):
+    while True:
+        try:
+            write_metrics_file(path)
+        except OSError as error:
+            logger.warning("could not write %s: %r", path, error)
+        time.sleep(interval)
+
+def start_exporter():
+    """Start the configured exporters, once per process."""
+    global _exporter_started
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    if os.environ.get("METRICS_PORT"):
+        address = (os.environ.get("METRICS_HOST", "127.0.0.1"), int(os.environ["METRICS_PORT"]))
+        server = http.server.ThreadingHTTPServer(address, MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("serving metrics on http://%s:%d/metrics", *address)
+    if os.environ.get("METRICS_FILE"):
+        interval = float(os.environ.get("METRICS_INTERVAL", 15))
+        threading.Thread(target=write_metrics_file_forever, args=(os.environ["METRICS_FILE"], interval),
+                         name="metrics-file", daemon=True).start()
@@ -0,0 +1,69 @@
+import argparse
+
+from utils import DELTA_KEYS, build_delta_data, ensure_indexes, get_mongo_collection
+
+# Month-close refresh of delta_data. MONTH is part of delta_data's grain (see utils.DELTA_KEYS), so the delta rows of
+# one month depend only on that month's user_data rows in the two compared years: when a month's sales land or are
+# corrected, `python month_close.py Jun` rebuilds just that partition and upserts it into the delta collection, instead
+# of recomputing both years' groupbys and the outer merge over all of history. The user_data read goes through the
+# (YEAR, MONTH, ...) compound index and the upserts through the delta one (see utils.INDEXES), so the cost follows the
+# size of one month.
+
+
+def delta_year(delta):
+    """The current year of the delta collection, from the Revenue_<year> fields of one of its documents."""
+    from pvm import delta_years
+    import pandas as pd
+    document = delta.find_one({}, {"_id": 0})
+    if document is None:
+        raise ValueError("the delta collection is empty: build it in full first (see the Data Processing notebook)")
+    return delta_years(pd.DataFrame([document]))[1]
+
+def read_month(users, month, year):
+    """The user_data rows of `month` in `year` and the year before."""
+    import pandas as pd
+    rows = pd.DataFrame(list(users.find({"YEAR": {"$in": [year - 1, year]}, "MONTH": month}, {"_id": 0})))
+    return rows if len(rows) else pd.DataFrame(columns=["YEAR"] + DELTA_KEYS)
+
+def delta_partition(df, month, year):
+    """The delta_data rows of `month`, from user_data rows that include at least that month of both years."""
+    return build_delta_data(df[df["MONTH"] == month], year=year)
+
+def upsert_partition(delta, partition, month):
+    """
+    Replace the delta documents of `month` with `partition`: each row is upserted on its DELTA_KEYS, then the month's
+    documents whose keys are no longer in the partition are deleted. Returns (upserted, deleted).
+    """
+    from pymongo import ReplaceOne
+    documents = partition.astype(object).where(partition.notna(), None).to_dict("records")
+    if documents:
+        delta.bulk_write([ReplaceOne({key: document[key] for key in DELTA_KEYS}, document, upsert=True)
+                          for document in documents], ordered=False)
+    current = {tuple(document[key] for key in DELTA_KEYS) for document in documents}
+    stale = [document["_id"] for document in delta.find({"MONTH": month}, {key: 1 for key in DELTA_KEYS})
+             if tuple(document.get(key) for key in DELTA_KEYS) not in current]
+    if stale:
+        delta.delete_many({"_id": {"$in": stale}})
+    return len(documents), len(stale)
+
+def close_month(month, year=None):
+    """Rebuild and upsert the delta rows of `month` (for the delta collection's current year unless `year` is given)."""
+    users, delta = get_mongo_collection("users"), get_mongo_collection("delta")
+    for name in ("users", "delta"):
+        ensure_indexes(name)
+    year = year or delta_year(delta)
+    return upsert_partition(delta, delta_partition(read_month(users, month, year), month, year), month)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the delta_data rows of the given months in MongoDB.")
+    parser.add_argument("months", nargs="+", help="month names as in user_data, e.g. Jun")
+    parser.add_argument("--year", type=int, help="the current year of the comparison (default: the delta collection's)")
+    args = parser.parse_args()
+    for month in args.months:
+        upserted, deleted = close_month(month, args.year)
+        print(f"{month}: upserted {upserted:,} delta rows, deleted {deleted:,}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import streamlit as st
+
+from profiling import profiled, profiled_cache
+from pvm import HIERARCHIES
+from utils import MONTHS_ORDER
+
+# Period comparisons (MTD, QTD, YTD, rolling 12 months, and each against the same period last year) from cumulative
+# monthly sums. The index keeps, for every key of a dimension, the running total of each measure over a contiguous
+# month timeline, so the sum over any run of months is the difference of two prefix entries: one lookup per key,
+# vectorized over all of a dimension's keys, instead of a groupby over the raw rows.
+
+
+# Dimensions with a prefix index: every level of the channel and product hierarchies, and None for the overall total
+DIMENSIONS = [None] + [level for levels in HIERARCHIES.values() for level in levels]
+MEASURES = ["Revenue", "Total GM [CAD]", "QTY [Units]"]
+
+# Period -> number of months up to and including the as-of month (month is its position in the year, from 0)
+PERIODS = {
+    "MTD": lambda month: 1,
+    "QTD": lambda month: month % 3 + 1,
+    "YTD": lambda month: month + 1,
+    "R12": lambda month: 12,
+}
+
+
+@profiled_cache(st.cache_resource, max_entries=4)
+def get_period_index(data_key, _source):
+    """The period index of a users source, cached on its key (see utils.get_source)."""
+    return build_index(_source)
+
+@profiled
+def build_index(source):
+    """
+    {"first_year": int, dimension: (keys, prefix)}: `prefix[k, t, m]` is the sum of measure `m` for key `k` over the
+    first `t` months of the timeline, which starts in January of the first year.
+    """
+    from backends import as_query
+    query = as_query(source)
+    years = [int(year) for year in query.distinct("YEAR")]
+    first_year, months = min(years), (max(years) - min(years) + 1) * 12
+    index = {"first_year": first_year}
+    aggregations = {measure: "sum" for measure in MEASURES}
+    for levels in HIERARCHIES.values():
+        # One pass over the rows per hierarchy, at its finest level; the coarser levels are summed from that
+        finest = query.aggregate(by=["YEAR", "MONTH"] + levels, aggregations=aggregations)
+        finest = finest[finest["MONTH"].isin(MONTHS_ORDER)]
+        for dimension in [None] + levels:
+            if dimension not in index:
+                by = ["YEAR", "MONTH"] + ([dimension] if dimension else [])
+                index[dimension] = prefix_sums(finest.groupby(by, sort=False)[MEASURES].sum().reset_index(),
+                                               dimension, first_year, months)
+    return index
+
+def prefix_sums(frame, dimension, first_year, months):
+    """(keys, prefix) for a frame of monthly sums per YEAR, MONTH and `dimension` (see build_index)."""
+    import numpy as np
+    keys = np.array(["Total"], dtype=object) if dimension is None else frame[dimension].unique()
+    codes = np.zeros(len(frame), dtype=int) if dimension is None else frame[dimension].map({key: code for code, key in enumerate(keys)}).to_numpy()
+    timeline = (frame["YEAR"].to_numpy(dtype=int) - first_year) * 12 + frame["MONTH"].map(MONTHS_ORDER.index).to_numpy()
+    monthly = np.zeros((len(keys), months + 1, len(MEASURES)))
+    np.add.at(monthly, (codes, timeline + 1), frame[MEASURES].to_numpy(dtype=float))
+    return keys, monthly.cumsum(axis=1)
+
+def window(index, period, year, month, years_back=0):
+    """The [start, end) months of `period` ending at `month` of `year`, as positions on the index's timeline."""
+    position = MONTHS_ORDER.index(month)
+    end = (year - years_back - index["first_year"]) * 12 + position + 1
+    return end - PERIODS[period](position), end
+
+def covered(index, period, year, month):
+    """True if the data reaches back to the start of the same period last year, so the comparison is complete."""
+    return window(index, period, year, month, years_back=1)[0] >= 0
+
+def period_sum(index, dimension, period, year, month, measure, years_back=0):
+    """
+    The sum of `measure` per key of `dimension` over `period` ending at `month` of `year` (`years_back` years
+    earlier for the same period last year), as a series; months outside the data count as zero.
+    """
+    import numpy as np
+    import pandas as pd
+    keys, prefix = index[dimension]
+    start, end = (int(np.clip(bound, 0, prefix.shape[1] - 1)) for bound in window(index, period, year, month, years_back))
+    column = MEASURES.index(measure)
+    return pd.Series(prefix[:, end, column] - prefix[:, start, column], index=pd.Index(keys, name=dimension or "Total"))
+
+@profiled
+def growth(index, dimension, period, year, month, measure):
+    """
+    Per key of `dimension`: `measure` over the period, over the same period last year, and the growth in % (NaN when
+    last year's sum is zero or the data doesn't cover all of last year's period).
+    """
+    import numpy as np
+    current = period_sum(index, dimension, period, year, month, measure)
+    prior = period_sum(index, dimension, period, year, month, measure, years_back=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where((prior != 0) & covered(index, period, year, month), (current - prior) / prior * 100, np.nan)
+    return current.rename("Current").to_frame().assign(**{"Same Period Last Year": prior, "Growth %": change}).reset_index()
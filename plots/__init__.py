@@ -1 +1 @@
-import plots.plots
\ No newline at end of file
+from plots import plots
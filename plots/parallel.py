@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import streamlit as st
+
+from plots import plots
+from profiling import profiled_cache, record, submit, timing_logger
+from utils import apply_filters, default_choice, get_source
+
+
+logger = timing_logger(__name__)  # the per-chart timings go to PROFILE_LOG with the profiles
+
+# One pool per process, shared by every session, so concurrent users can't multiply the number of build threads.
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+_thread_pool = None
+_process_pool = None
+_pool_lock = threading.Lock()  # sessions' first reruns race to create the pools
+
+# Warm-ups get a single thread of their own: they fill the cache in idle time and never compete with the interactive
+# pool for workers. A page is warmed once per data key of its datasets: after a Mongo cache rollover, a new shared
+# store version or a rewritten file the next full rerun of any session warms it again.
+WARM_UP_WORKERS = 1
+_warm_up_pool = ThreadPoolExecutor(max_workers=WARM_UP_WORKERS, thread_name_prefix="warm-up")
+_warm_up_lock = threading.Lock()
+_warmed_up = {}  # page -> the data key it was last warmed for
+_queued = set()  # pages queued or warming
+
+
+def get_pool(processes=False):
+    """Return the shared thread pool, or the shared process pool for heavy aggregations."""
+    global _thread_pool, _process_pool
+    with _pool_lock:
+        if processes:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            return _process_pool
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="chart-builder")
+        return _thread_pool
+
+
+def timed_call(func, *args):
+    """Run func(*args) and return its result with the elapsed seconds."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def build_chart(name, df):
+    """Build one figure by its builder name in plots/plots.py (a module-level function, so it can be pickled)."""
+    return timed_call(getattr(plots, name), df)
+
+
+def build_figures(jobs, processes=False):
+    """
+    Build independent figures concurrently. `jobs` is a list of (builder name, frame) pairs; the figures come back
+    in the same order, so callers can place them into their st.columns layout positionally.
+    Pandas aggregations release the GIL for most of their work, so threads are the default; processes avoid the GIL
+    entirely but pickle every frame they are given.
+    """
+    start = time.perf_counter()
+    if processes:
+        futures = [get_pool(processes).submit(build_chart, name, df) for name, df in jobs]
+    else:
+        futures = [submit(get_pool(), build_chart, name, df) for name, df in jobs]
+    results = [future.result() for future in futures]
+    for (name, df), (_, elapsed) in zip(jobs, results):
+        logger.info("built %s from %d rows in %.1f ms", name, len(df), elapsed * 1000)
+        if processes:  # worker processes don't share the profile: record the timings they sent back
+            record(stage=name, kind="figure", rows_in=len(df), ms=round(elapsed * 1000, 2))
+    logger.info("built %d figures in %.1f ms", len(jobs), (time.perf_counter() - start) * 1000)
+    return [figure for figure, _ in results]
+
+
+def page_columns(page):
+    """The columns a chart page's builders read (see plots.COLUMNS), or None for every column if one isn't listed."""
+    charts = [chart for row in page["charts"] for chart in row]
+    if not all(chart in plots.COLUMNS for chart in charts):
+        return None
+    return list(dict.fromkeys(column for chart in charts for column in plots.COLUMNS[chart]))
+
+@profiled_cache(st.cache_data, show_spinner=False, max_entries=128)
+def page_figures(charts, selection, data_key, _df_filtered, _processes=False, _concurrent=True):
+    """
+    Figures for a chart page, cached on the chart names, the filter selection and the source datasets' keys
+    (`data_key`), so a warmed-up page and an interactive visit with the same filters share one entry.
+    """
+    jobs = [(chart, _df_filtered) for chart in charts]
+    if _concurrent:
+        return build_figures(jobs, _processes)
+    return [build_chart(name, df)[0] for name, df in jobs]
+
+
+def warm_up_page(name, page):
+    """Resolve a chart page's datasets and default filters headlessly and cache its figures, unless already warm."""
+    start = time.perf_counter()
+    datasets = [get_source(dataset) for dataset in page["datasets"]]
+    data_key = tuple(source.key for source in datasets)
+    if _warmed_up.get(name) == data_key:
+        return
+    df_filtered, selection = apply_filters(datasets[0], page["filters"], default_choice, page_columns(page))
+    charts = tuple(chart for row in page["charts"] for chart in row)
+    page_figures(charts, selection, data_key, df_filtered, _concurrent=False)
+    _warmed_up[name] = data_key
+    logger.info("warmed up %s in %.1f ms", name, (time.perf_counter() - start) * 1000)
+
+
+def schedule_warm_up(pages, active):
+    """Queue every chart page except the active one for warm-up; a page already queued or warming is skipped."""
+    for name, page in pages.items():
+        if name == active or "charts" not in page:
+            continue
+        with _warm_up_lock:
+            if name in _queued:
+                continue
+            _queued.add(name)
+        _warm_up_pool.submit(warm_up_page, name, page).add_done_callback(
+            lambda future, name=name: _warm_up_done(future, name))
+
+
+def _warm_up_done(future, name):
+    """Let the page be queued again, and log a failed warm-up (the next rerun retries it)."""
+    with _warm_up_lock:
+        _queued.discard(name)
+    if future.exception() is not None:
+        logger.warning("warm-up of %s failed: %r", name, future.exception())
@@ -1,15 +1,59 @@
 import numpy as np
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from elasticity import fit, monthly_points
+from pvm import revenue_columns, rollup
+from waterfall import DISCOUNTS, LEVELS, leakage_ranking, waterfall
 from utils import *
 
 
 
+# The user_data columns each builder reads: a chart page whose builders are all listed fetches only these (see
+# plots.parallel.page_columns and backends.py). delta_data builders read Revenue_<year> columns named by the data,
+# so they aren't listed and their pages fetch every column.
+COLUMNS = {
+    "average_discount_rate_card": ["MONTH", "Standard Discount [SD1 %]", "Standard Discount [SD2 %]",
+        "Special Discount [DSP %]", "Promo Campaign [DPR%]", "Revenue"],
+    "average_list_price_card": ["MONTH", "List Price [CAD]"],
+    "average_selling_price_card": ["MONTH", "QTY [Units]", "Revenue"],
+    "avg_disc_given": ["Customer Name", "Standard Discount [SD1][CAD]", "Standard Discount [SD2][CAD]",
+        "Special Discount [DSP][CAD]"],
+    "avg_unit_prc": ["MONTH", "List Price [CAD]", "Net Price [CAD]"],
+    "avg_unit_prc_per_customer": ["Customer Name", "List Price [CAD]", "Net Price [CAD]", "Revenue"],
+    "channel_distribution": ["Channel Sub-Category", "QTY [Units]"],
+    "clv_plot": ["Customer Name", "Revenue"],
+    "customer_distribution": ["Customer Name", "Revenue"],
+    "discount_evo": ["MONTH", "Standard Discount [SD1 %]", "Standard Discount [SD2 %]", "Special Discount [DSP %]",
+        "Promo Campaign [DPR%]"],
+    "expenses_pie": ["Standard Discount [SD1][CAD]", "Standard Discount [SD2][CAD]", "Special Discount [DSP][CAD]",
+        "Promo Campaign [DPR][CAD]", "Rebates [DREB][CAD]"],
+    "income_statement": ["MONTH", "Standard Discount [SD1][CAD]", "Standard Discount [SD2][CAD]",
+        "Special Discount [DSP][CAD]", "Promo Campaign [DPR][CAD]", "Revenue", "Total Cost [CAD]"],
+    "list_price_sales_card": ["MONTH", "List Price [CAD]"],
+    "monthly_rev_gm": ["MONTH", "Revenue", "Total GM [CAD]"],
+    "net_sales_card": ["MONTH", "Net Price [CAD]"],
+    "price_elasticity": ["YEAR", "MONTH", "Customer Code", "Channel Category", "QTY [Units]", "Revenue"],
+    "price_leakage": ["Customer Name", "List Price [CAD]", "QTY [Units]",
+        *[column for columns in DISCOUNTS.values() for column in columns]],
+    "price_waterfall": ["List Price [CAD]", "QTY [Units]", *[column for columns in DISCOUNTS.values() for column in columns]],
+    "product_performance": ["Product Range", "QTY [Units]", "Unit GM [%]"],
+    "profit_margin_card": ["MONTH", "Revenue", "Total GM [CAD]"],
+    "rev_by_customer": ["Customer Name", "QTY [Units]", "Revenue", "Total GM [CAD]"],
+    "sales_revenue_card": ["MONTH", "Revenue"],
+    "total_prod_GM_card": ["MONTH", "Total GM [CAD]"],
+    "total_prod_qty_card": ["MONTH", "QTY [Units]"],
+    "total_prod_rev_card": ["MONTH", "Revenue"],
+    "unit_sold_wrt_campaign": ["MONTH", "Promo Campaign [DPR%]", "QTY [Units]"],
+    "units_sold_card": ["MONTH", "QTY [Units]"],
+}
+
 colors = ["#2a9d8f", "#264653", "#e9c46a", "#f4a261", "#e76f51", "#ef233c", "#f6bd60", "#84a59d", "#f95738"]
 # colors = ["#880d1e", "#f26a8d", "#dd2d4a", "#f49cbb", "#cbeef3", "#880d1e"]
 
+@profiled
 def sales_revenue_card(df):
     sales_by_month = df.groupby("MONTH")["Revenue"].sum()
     sales_by_month = sales_by_month.reindex(MONTHS_ORDER).reset_index()
@@ -35,6 +79,7 @@ def sales_revenue_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def list_price_sales_card(df):
     sales_by_month = df.groupby("MONTH")["List Price [CAD]"].mean()
     sales_by_month = sales_by_month.reindex(MONTHS_ORDER).reset_index()
@@ -60,6 +105,7 @@ def list_price_sales_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def net_sales_card(df):
     sales_by_month = df.groupby("MONTH")["Net Price [CAD]"].mean()
     sales_by_month = sales_by_month.reindex(MONTHS_ORDER).reset_index()
@@ -85,6 +131,7 @@ def net_sales_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def units_sold_card(df):
     qty_sold = df.groupby("MONTH")["QTY [Units]"].sum()
     qty_sold = qty_sold.reindex(MONTHS_ORDER).reset_index()
@@ -110,6 +157,7 @@ def units_sold_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def profit_margin_card(df):
     monthly_financials = df.groupby("MONTH").agg({"Revenue": "sum", "Total GM [CAD]": "sum"})
     monthly_financials = monthly_financials.reindex(MONTHS_ORDER).reset_index()
@@ -141,15 +189,21 @@ def profit_margin_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def average_discount_rate_card(df):
     # Calculate the weighted discount rates, assuming discounts are stored as proportions (e.g., 20% is stored as 0.20)
-    df['Weighted SD1'] = df['Standard Discount [SD1 %]'] * df['Revenue']
-    df['Weighted SD2'] = df['Standard Discount [SD2 %]'] * df['Revenue']
-    df['Weighted DSP'] = df['Special Discount [DSP %]'] * df['Revenue']
-    df['Weighted DPR'] = df['Promo Campaign [DPR%]'] * df['Revenue']
+    # Built as a separate frame: the input may be the shared cached data and must not be written to
+    weighted = pd.DataFrame({
+        'MONTH': df['MONTH'],
+        'Weighted SD1': df['Standard Discount [SD1 %]'] * df['Revenue'],
+        'Weighted SD2': df['Standard Discount [SD2 %]'] * df['Revenue'],
+        'Weighted DSP': df['Special Discount [DSP %]'] * df['Revenue'],
+        'Weighted DPR': df['Promo Campaign [DPR%]'] * df['Revenue'],
+        'Revenue': df['Revenue'],
+    })
 
     # Aggregate these weighted discounts and sum of revenue by month
-    monthly_discounts = df.groupby('MONTH').agg({
+    monthly_discounts = weighted.groupby('MONTH').agg({
         'Weighted SD1': 'sum',
         'Weighted SD2': 'sum',
         'Weighted DSP': 'sum',
@@ -191,6 +245,7 @@ def average_discount_rate_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def average_selling_price_card(df):
     # Calculate the Average Selling Price (ASP) by dividing total revenue by total units sold
     # Group by month to get monthly ASP
@@ -226,13 +281,14 @@ def average_selling_price_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def income_statement(df):
-    df['CoGS'] = df['Total Cost [CAD]']
-    df['Total Expense'] = df['Standard Discount [SD1][CAD]'] + df['Standard Discount [SD2][CAD]'] + df[
+    fin_data = pd.DataFrame({'MONTH': df['MONTH'], 'CoGS': df['Total Cost [CAD]'], 'Revenue': df['Revenue']})
+    fin_data['Total Expense'] = df['Standard Discount [SD1][CAD]'] + df['Standard Discount [SD2][CAD]'] + df[
         'Special Discount [DSP][CAD]'] + df['Promo Campaign [DPR][CAD]']
-    df['Net Profit'] = df['Revenue'] - df['Total Expense'] - df['CoGS']
+    fin_data['Net Profit'] = fin_data['Revenue'] - fin_data['Total Expense'] - fin_data['CoGS']
 
-    fin_data = df.groupby("MONTH")[['Total Expense', 'CoGS', 'Revenue', 'Net Profit']].sum()
+    fin_data = fin_data.groupby("MONTH")[['Total Expense', 'CoGS', 'Revenue', 'Net Profit']].sum()
     fin_data = fin_data.reindex(MONTHS_ORDER).reset_index()
     fig = go.Figure()
     fig.add_trace(
@@ -257,6 +313,7 @@ def income_statement(df):
     fig.update_xaxes(type='category')
     return fig
 
+@profiled
 def expenses_pie(df):
     summed_discounts = df[['Standard Discount [SD1][CAD]', 'Standard Discount [SD2][CAD]',
                            'Special Discount [DSP][CAD]', 'Promo Campaign [DPR][CAD]',
@@ -272,6 +329,7 @@ def expenses_pie(df):
     fig = update_hover_layout(fig)
     return fig
 
+@profiled
 def monthly_rev_gm(filtered_data):
     revenue_data = filtered_data.groupby("MONTH")[["Revenue", "Total GM [CAD]"]].sum()
     revenue_data = revenue_data.reindex(MONTHS_ORDER).reset_index()
@@ -290,9 +348,10 @@ def monthly_rev_gm(filtered_data):
     fig = update_hover_layout(fig)
     return fig
 
+@profiled
 def product_performance(df):
-    df["Unit GM [%]"] = pd.to_numeric(df['Unit GM [%]'], errors='coerce')
-    prod_data = df.groupby("Product Range").agg(
+    unit_gm = pd.to_numeric(df['Unit GM [%]'], errors='coerce')
+    prod_data = df[["Product Range", "QTY [Units]"]].assign(**{"Unit GM [%]": unit_gm}).groupby("Product Range").agg(
         {"Unit GM [%]": "mean",
          "QTY [Units]": "sum"}
     ).reset_index()
@@ -306,7 +365,7 @@ def product_performance(df):
     )
     fig.add_trace(
         go.Scatter(
-            x=prod_data["Product Range"], y=df["Unit GM [%]"], name="Unit GM [%]",
+            x=prod_data["Product Range"], y=unit_gm, name="Unit GM [%]",
             marker=dict(color="#e76f51"), mode="markers+lines",
             hovertemplate='%{y:.2f}',
         ), secondary_y=True
@@ -315,6 +374,7 @@ def product_performance(df):
     fig = update_hover_layout(fig)
     return fig
 
+@profiled
 def customer_distribution(df):
     prod_data = df.groupby('Customer Name').agg({'Revenue':'sum'}).sort_values(by='Customer Name', ascending=False).reset_index()
     fig = go.Figure(data=[go.Pie(labels=prod_data["Customer Name"], values=prod_data["Revenue"], name="Revenue", marker_colors=colors, title="Revenue", hole=.4, hoverinfo="label+percent+name")])
@@ -322,6 +382,7 @@ def customer_distribution(df):
     fig = update_hover_layout(fig)
     return fig
 
+@profiled
 def channel_distribution(df):
     # Group data by 'Channel Sub-Category' instead of 'Channel Category'
     prod_data = df.groupby('Channel Sub-Category').agg({'QTY [Units]':'sum'}).reset_index()
@@ -351,6 +412,7 @@ def channel_distribution(df):
 
     return fig
 
+@profiled
 def rev_by_customer(df):
     prod_data = df.groupby("Customer Name")[["Revenue", "Total GM [CAD]", "QTY [Units]"]].sum().reset_index()
     fig = make_subplots(rows=1, cols=3, specs=[[{'type': 'domain'}, {'type': 'domain'}, {'type': 'domain'}]])
@@ -368,9 +430,10 @@ def rev_by_customer(df):
     fig = update_hover_layout(fig)
     return fig
 
+@profiled
 def avg_disc_given(df):
-    df["Total Discount"] = df['Standard Discount [SD1][CAD]'] + df['Standard Discount [SD2][CAD]'] + df['Special Discount [DSP][CAD]']
-    df = df.groupby("Customer Name")["Total Discount"].mean().reset_index()
+    total_discount = df['Standard Discount [SD1][CAD]'] + df['Standard Discount [SD2][CAD]'] + df['Special Discount [DSP][CAD]']
+    df = total_discount.groupby(df["Customer Name"]).mean().rename("Total Discount").reset_index()
 
     fig = go.Figure(
         go.Bar(x=df["Customer Name"], y=df["Total Discount"],
@@ -381,6 +444,7 @@ def avg_disc_given(df):
     fig = update_hover_layout(fig)
     return fig
 
+@profiled
 def clv_plot(df):
     # Calculate Customer Lifetime Value approximation
     clv = df.groupby('Customer Name')['Revenue'].sum().sort_values(ascending=False).reset_index()
@@ -402,6 +466,7 @@ def clv_plot(df):
     fig_clv = update_hover_layout(fig_clv)
     return fig_clv
 
+@profiled
 def average_list_price_card(df):
     monthly_sales = df.groupby("MONTH")["List Price [CAD]"].mean()
     monthly_sales = monthly_sales.reindex(MONTHS_ORDER).reset_index()
@@ -426,6 +491,7 @@ def average_list_price_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def total_prod_qty_card(df):
     monthly_sales = df.groupby("MONTH")["QTY [Units]"].sum()
     monthly_sales = monthly_sales.reindex(MONTHS_ORDER).reset_index()
@@ -450,6 +516,7 @@ def total_prod_qty_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def total_prod_rev_card(df):
     monthly_sales = df.groupby("MONTH")["Revenue"].sum()
     monthly_sales = monthly_sales.reindex(MONTHS_ORDER).reset_index()
@@ -474,6 +541,7 @@ def total_prod_rev_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def total_prod_GM_card(df):
     monthly_sales = df.groupby("MONTH")["Total GM [CAD]"].sum()
     monthly_sales = monthly_sales.reindex(MONTHS_ORDER).reset_index()
@@ -498,11 +566,12 @@ def total_prod_GM_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def summary_rev_sum_card(df):
     fig = go.Figure(
         go.Indicator(
             mode="number",
-            value=df["Revenue_2022"].sum() + df["Revenue_2023"].sum(),
+            value=df[revenue_columns(df)].sum().sum(),
             number={"prefix": "C$", "font": {"size": 32}},
             title={"text": "Sum of Revenue", "font": {"size": 20}},
             domain={'y': [0, 1], 'x': [0.25, 0.75]}
@@ -513,6 +582,7 @@ def summary_rev_sum_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def summary_delta_price_sum_card(df):
     fig = go.Figure(
         go.Indicator(
@@ -528,6 +598,7 @@ def summary_delta_price_sum_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def summary_delta_volume_sum_card(df):
     fig = go.Figure(
         go.Indicator(
@@ -543,12 +614,14 @@ def summary_delta_volume_sum_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def summary_delta_volume_perct_card(df):
-    df = df[df['Revenue_2023'] > 0]
+    prior, current = revenue_columns(df)
+    df = df[df[current] > 0]
     fig = go.Figure(
         go.Indicator(
             mode="number",
-            value=df["Delta Volume [CAD]"].sum() / df["Revenue_2022"].sum() * 100,
+            value=df["Delta Volume [CAD]"].sum() / df[prior].sum() * 100,
             number={"suffix": " %", "font": {"size": 32}},
             title={"text": "Sum of Delta Volume%", "font": {"size": 20}},
             domain={'y': [0, 1], 'x': [0.25, 0.75]}
@@ -559,12 +632,14 @@ def summary_delta_volume_perct_card(df):
     fig.update_layout(height=250)
     return fig
 
+@profiled
 def summary_delta_price_perct_card(df):
-    df = df[df['Revenue_2023'] > 0]
+    prior, current = revenue_columns(df)
+    df = df[df[current] > 0]
     fig = go.Figure(
         go.Indicator(
             mode="number",
-            value=df["Delta Price [CAD]"].sum() / df["Revenue_2022"].sum() * 100,
+            value=df["Delta Price [CAD]"].sum() / df[prior].sum() * 100,
             number={"suffix": " %", "font": {"size": 32}},
             title={"text": "Sum of Delta Price%", "font": {"size": 20}},
             domain={'y': [0, 1], 'x': [0.25, 0.75]}
@@ -575,31 +650,24 @@ def summary_delta_price_perct_card(df):
     fig.update_layout(height=250)
     return fig
 
-def top_10_customers(df):
-    top_10_customers = df.groupby('Customer Name')['Revenue'].sum().nlargest(10).reset_index()
-    fig = go.Figure(
-        go.Bar(x=top_10_customers['Customer Name'], y=top_10_customers['Revenue'],
-               marker=dict(color=colors[0]))
-    )
-    fig.update_layout(barmode='group', xaxis_title="Customer Name", yaxis_title="Revenue", title_text='Top 10 Customers by Revenue')
-    fig = update_hover_layout(fig)
-    return fig
-
-def top_10_products(df):
-    top_10_products = df.groupby('Product Range')['Revenue'].sum().nlargest(10).reset_index()
+@profiled
+def top_n_bar(ranking, title):
+    """Bars of a ranking frame (see rankings.top_n): its first column on x, its measure on y."""
+    dimension, measure = ranking.columns[:2]
     fig = go.Figure(
-        go.Bar(x=top_10_products['Product Range'], y=top_10_products['Revenue'],
+        go.Bar(x=ranking[dimension], y=ranking[measure],
                marker=dict(color=colors[0]))
     )
     fig = update_hover_layout(fig)
-    fig.update_layout(barmode='group', xaxis_title="Product Range", yaxis_title="Revenue", title_text='Top 10 Products by Revenue')
+    fig.update_layout(barmode='group', xaxis_title=dimension, yaxis_title=measure, title_text=title)
     return fig
 
+@profiled
 def delta_qty_wrt_channel_category(df):
-    melted_df = df.groupby("Channel Category")[['Delta Price %', 'Delta Volume %']].mean().reset_index()
+    melted_df = rollup(df, [("Channel Category",)])[("Channel Category",)]
     fig = go.Figure()
     ind = 0
-    for cat in ['Delta Price %', 'Delta Volume %']:
+    for cat in ['Delta Price %', 'Delta Volume %', 'Delta Mix %']:
         fig.add_trace(go.Bar(
             x=melted_df["Channel Category"], y=melted_df[cat], name=cat,
             textposition="inside", marker=dict(color=colors[ind]),
@@ -607,15 +675,16 @@ def delta_qty_wrt_channel_category(df):
         ))
         ind += 1
     fig = update_hover_layout(fig)
-    fig.update_layout(title="YTD Delta Price and Delta Volume",
+    fig.update_layout(title="YTD Delta Price, Volume and Mix",
                       xaxis_title="Channel Category", yaxis_title="%age")
     return fig
 
+@profiled
 def delta_qty_wrt_product_category(df):
-    melted_df = df.groupby("Product Category")[['Delta Price %', 'Delta Volume %']].mean().reset_index()
+    melted_df = rollup(df, [("Product Category",)])[("Product Category",)]
     fig = go.Figure()
     ind = 0
-    for cat in ['Delta Price %', 'Delta Volume %']:
+    for cat in ['Delta Price %', 'Delta Volume %', 'Delta Mix %']:
         fig.add_trace(go.Bar(
             x=melted_df["Product Category"], y=melted_df[cat], name=cat,
             textposition="inside", marker=dict(color=colors[ind]),
@@ -623,12 +692,13 @@ def delta_qty_wrt_product_category(df):
         ))
         ind += 1
     fig = update_hover_layout(fig)
-    fig.update_layout(title="YTD Delta Price and Delta Volume",
+    fig.update_layout(title="YTD Delta Price, Volume and Mix",
                       xaxis_title="Product Category", yaxis_title="%age")
     return fig
 
+@profiled
 def rev_sum_wrt_channel_category(df):
-    df = df.melt(id_vars='Channel Category', value_vars=['Revenue_2022', 'Revenue_2023'], var_name='YEAR', value_name='Revenue')
+    df = df.melt(id_vars='Channel Category', value_vars=revenue_columns(df), var_name='YEAR', value_name='Revenue')
     df['YEAR'] = df['YEAR'].str[-4:]
     melted_df = df.groupby('Channel Category')['Revenue'].sum().reset_index()
 
@@ -642,8 +712,9 @@ def rev_sum_wrt_channel_category(df):
                       xaxis_title="Channel Category", yaxis_title="Amount")
     return fig
 
+@profiled
 def rev_wrt_channel_category_and_prod_family(df):
-    df = df.melt(id_vars='Product Category', value_vars=['Revenue_2022', 'Revenue_2023'], var_name='YEAR', value_name='Revenue')
+    df = df.melt(id_vars='Product Category', value_vars=revenue_columns(df), var_name='YEAR', value_name='Revenue')
     df['YEAR'] = df['YEAR'].str[-4:]
     grouped_df = df.groupby(['Product Category', 'YEAR'])['Revenue'].sum().reset_index()
 
@@ -658,14 +729,15 @@ def rev_wrt_channel_category_and_prod_family(df):
     fig.update_xaxes(tickmode='linear', dtick=1)
     return fig
 
+@profiled
 def rev_wrt_year_channel_n_product_category(df):
-    df = df.melt(id_vars=['Channel Category', 'Product Category'], value_vars=['Revenue_2022', 'Revenue_2023'], var_name='YEAR', value_name='Revenue')
+    df = df.melt(id_vars=['Channel Category', 'Product Category'], value_vars=revenue_columns(df), var_name='YEAR', value_name='Revenue')
     df['YEAR'] = df['YEAR'].str[-4:]
 
     fig = px.bar(df, x='Channel Category', y='Revenue', color='Product Category', facet_col='YEAR', barmode='stack',
                 category_orders={'YEAR': sorted(df['YEAR'].unique())}, labels={'Revenue': 'Sum of Revenue'},
                 color_discrete_sequence=colors,
-                title='Revenue by Product and Channel Category for 2022 and 2023')
+                title='Revenue by Product and Channel Category per Year')
     fig = update_hover_layout(fig)
     fig.update_layout(title="YTD Revenue vs Prior Year",barmode="stack",
                       xaxis_title='Channel Category', yaxis_title='Sum of Revenue')
@@ -673,6 +745,7 @@ def rev_wrt_year_channel_n_product_category(df):
     fig.update_traces(marker_line_width=0)
     return fig
 
+@profiled
 def performance_mtd(df):
     # Filter data for Appliances and Electronics
     filtered_df = df[df['Product Category'].isin(['Appliances', 'Electronics'])]
@@ -699,6 +772,7 @@ def performance_mtd(df):
         charts[year] = chart
     return charts
 
+@profiled
 def unit_sold_wrt_campaign(df):
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fin_data = df.groupby("MONTH").agg({'QTY [Units]':'sum', 'Promo Campaign [DPR%]':'mean'})
@@ -726,6 +800,7 @@ def unit_sold_wrt_campaign(df):
     fig.update_layout(title_text="Unit Sold w.r.t Promo Campaign (%)", xaxis_title="Month")
     return fig
 
+@profiled
 def avg_unit_prc(df):
     fig = make_subplots()
     fin_data = df.groupby("MONTH")[['Net Price [CAD]', 'List Price [CAD]']].mean()
@@ -749,6 +824,7 @@ def avg_unit_prc(df):
     fig.update_layout(title_text="Avg Unit Price", xaxis_title="Month", yaxis_title="Avg Price", legend_title="Price Type")
     return fig
 
+@profiled
 def avg_unit_prc_per_customer(df):
     # Assuming 'Customer Name' is the name of the column that contains customer names,
     # 'Revenue' is the name of the column that contains revenue data,
@@ -807,6 +883,7 @@ def avg_unit_prc_per_customer(df):
 
     return fig
 
+@profiled
 def discount_evo(df):
     percentage_columns = ['Standard Discount [SD1 %]', 'Standard Discount [SD2 %]', 'Special Discount [DSP %]', 'Promo Campaign [DPR%]']
     fin_data = df.groupby("MONTH")[percentage_columns].mean()
@@ -825,3 +902,54 @@ def discount_evo(df):
                   )
     fig.update_layout(title_text="Discount Evolution")
     return fig
+
+@profiled
+def price_waterfall(df):
+    """Average unit price from list to pocket: each discount as a drop and each price level as a subtotal."""
+    total = waterfall(df).iloc[0]
+    names, measures, values = ["List Price"], ["absolute"], [total["List Price"]]
+    for level, steps in LEVELS:
+        for step in steps:
+            names.append(step)
+            measures.append("relative")
+            values.append(-total[f"{step} [CAD]"] / total["QTY [Units]"])
+        names.append(f"{level} Price")
+        measures.append("total")
+        values.append(total[f"{level} Price"])
+    fig = go.Figure(go.Waterfall(
+        x=names, y=values, measure=measures,
+        text=[f"{value:,.2f}" for value in values], textposition="outside",
+        decreasing=dict(marker=dict(color=colors[4])), totals=dict(marker=dict(color=colors[1])),
+        increasing=dict(marker=dict(color=colors[0]))
+    ))
+    fig = update_hover_layout(fig)
+    fig.update_layout(title_text="Price Waterfall (avg per unit)", yaxis_title="Price [CAD]", hovermode="closest")
+    return fig
+
+@profiled
+def price_leakage(df):
+    """The customers giving away the largest share of list revenue, split by discount."""
+    ranking = leakage_ranking(df, "Customer Name")
+    fig = go.Figure()
+    for ind, step in enumerate(DISCOUNTS):
+        fig.add_trace(go.Bar(
+            x=ranking["Customer Name"], y=ranking[f"{step} [CAD]"] / ranking["List [CAD]"] * 100, name=step,
+            marker=dict(color=colors[ind])
+        ))
+    fig = update_hover_layout(fig)
+    fig.update_layout(barmode="stack", title_text="Price Leakage by Customer", xaxis_title="Customer Name",
+                      yaxis_title="% of List Revenue")
+    return fig
+
+@profiled
+def price_elasticity(df):
+    """The log-log price elasticity of demand per channel, fitted over its customers' monthly prices and quantities."""
+    fitted = fit(monthly_points(df, ["Channel Category"]), ["Channel Category"]).sort_values("Channel Category")
+    fig = go.Figure(go.Bar(
+        x=fitted["Channel Category"], y=fitted["Elasticity"], error_y=dict(type="data", array=fitted["Std Error"]),
+        customdata=fitted[["R²", "Points"]], marker=dict(color=colors[0]),
+        hovertemplate="%{x}<br>Elasticity: %{y:.2f}<br>R²: %{customdata[0]:.2f}<br>Points: %{customdata[1]}<extra></extra>"
+    ))
+    fig.update_layout(title_text="Price Elasticity of Demand by Channel", xaxis_title="Channel Category",
+                      yaxis_title="% Volume per 1% Price")
+    return fig
@@ -0,0 +1,186 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import streamlit as st
+
+from metrics import observe, observe_records
+
+# Per-rerun profiling. `profile()` collects a record for every `profiled` stage, cache lookup and filter step run inside
+# it, logs them as one JSON line, feeds them to the exported metrics and, for admins, shows them in a sidebar panel. Outside a profile the decorators only
+# cost one ContextVar lookup, so the warm-up thread and the benchmarks run uninstrumented.
+# The JSON lines (and the chart builders' timings, see plots/parallel.py) go to PROFILE_LOG: stderr by default ("-"),
+# a file path, or "off".
+
+
+_log_handler = None
+
+
+def timing_logger(name):
+    """Logger `name` at INFO, writing to PROFILE_LOG through one shared handler and not to the root logger."""
+    global _log_handler
+    log = logging.getLogger(name)
+    target = os.environ.get("PROFILE_LOG", "-")
+    if target == "off" or log.handlers:
+        return log
+    if _log_handler is None:
+        _log_handler = logging.StreamHandler(sys.stderr) if target == "-" else logging.FileHandler(target)
+        _log_handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    log.addHandler(_log_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return log
+
+logger = timing_logger(__name__)
+
+# The profile of the rerun in progress ({"records": [...], "detailed": bool}) or None. A ContextVar keeps concurrent
+# sessions apart; `submit` carries it into worker threads.
+_profile = contextvars.ContextVar("profile", default=None)
+_depth = contextvars.ContextVar("profile_depth", default=0)
+
+# tracemalloc is process-wide and slows every session while it runs, so it is opt-in: with PROFILE_TRACEMALLOC=1 it runs
+# while at least one detailed (admin) profile is open, and the profiles get the net allocations ("mb") of each stage.
+TRACEMALLOC = os.environ.get("PROFILE_TRACEMALLOC") == "1"
+_tracing_lock = threading.Lock()
+_tracing_profiles = 0
+
+
+def is_profiling(detailed=False):
+    """True inside a profile() (a detailed, admin one if `detailed`)."""
+    profile = _profile.get()
+    return profile is not None and (profile["detailed"] or not detailed)
+
+def record(**fields):
+    """Append a record to the current profile, if any, and return it (so the caller can complete it later)."""
+    profile = _profile.get()
+    if profile is None:
+        return None
+    entry = {"depth": _depth.get(), **fields}
+    profile["records"].append(entry)
+    return entry
+
+def submit(pool, func, *args):
+    """pool.submit(func, *args), running func in a copy of this context so its stages land in the current profile."""
+    return pool.submit(contextvars.copy_context().run, func, *args)
+
+def rows(value):
+    """Row count of a frame or series (or of the first frame of a tuple), else None."""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, "shape", None)
+    return int(shape[0]) if shape else None
+
+
+def profiled(func):
+    """
+    Record a call as a stage: wall time, net traced allocations (see TRACEMALLOC), rows in and out. A call that
+    returns a figure is recorded as a "figure", with the size and time of the JSON payload st.plotly_chart will send.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        entry = record(stage=func.__name__, kind="stage", rows_in=rows(args[0]) if args else None)
+        memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        depth = _depth.set(entry["depth"] + 1)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            entry["ms"] = round((time.perf_counter() - start) * 1000, 2)
+            _depth.reset(depth)
+        if memory is not None:
+            entry["mb"] = round((tracemalloc.get_traced_memory()[0] - memory) / 1e6, 3)
+        entry["rows_out"] = rows(result)
+        if hasattr(result, "to_plotly_json"):
+            entry["kind"] = "figure"
+        if profile["detailed"] and entry["kind"] == "figure":
+            start = time.perf_counter()
+            entry["payload_kb"] = round(len(result.to_json()) / 1000, 1)
+            entry["serialize_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+    return wrapper
+
+def profiled_cache(cache, **cache_kwargs):
+    """
+    Cache a function with `cache` (st.cache_data or st.cache_resource, given its arguments) and record every call
+    as a cache hit or miss. The function itself is `profiled`, so a miss also shows the stage it ran.
+    """
+    def decorator(func):
+        cached = cache(**cache_kwargs)(profiled(func))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _profile.get()
+            if profile is None:
+                return cached(*args, **kwargs)
+            entry = record(stage=func.__name__, kind="cache", cache="hit")
+            ran = len(profile["records"])
+            depth = _depth.set(entry["depth"] + 1)
+            start = time.perf_counter()
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                entry["ms"] = round((time.perf_counter() - start) * 1000, 2)
+                _depth.reset(depth)
+                if any(r["stage"] == func.__name__ and r["kind"] == "stage" for r in profile["records"][ran:]):
+                    entry["cache"] = "miss"
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def profile(label=None):
+    """
+    Profile the block. Nested blocks share the outermost block's profile, so a page fragment called from the script
+    also reports the data fetching before it; a block with a label reports the profile when it completes.
+    """
+    token = None
+    if _profile.get() is None:
+        detailed = st.session_state.get("role") == "admin"
+        token = _profile.set({"records": [], "detailed": detailed})
+        if detailed and TRACEMALLOC: _start_tracing()
+    start = time.perf_counter()
+    try:
+        yield
+        if label: report(label, _profile.get(), (time.perf_counter() - start) * 1000)
+    finally:
+        if token is not None:
+            observe_records(_profile.get()["records"])  # reruns cut short by st.stop() still built what they built
+            if _profile.get()["detailed"] and TRACEMALLOC: _stop_tracing()
+            _profile.reset(token)
+
+def report(label, profile, ms):
+    """Log the profile as one JSON line and the page's render time as a metric, and draw it in the sidebar for admins."""
+    logger.info(json.dumps({"page": label, "ms": round(ms, 1), "stages": profile["records"]}, default=str))
+    observe("aitionics_page_render_seconds", (("page", label),), ms / 1000)
+    if not profile["detailed"]:
+        return
+    import pandas as pd
+    table = pd.DataFrame(profile["records"])
+    table["stage"] = ["  " * depth + stage for depth, stage in zip(table.pop("depth"), table["stage"])]
+    with st.sidebar.expander("Profiling", expanded=True):
+        st.caption(f"{label}: {ms:.0f} ms")
+        st.dataframe(table, hide_index=True, use_container_width=True)
+
+def _start_tracing():
+    global _tracing_profiles
+    with _tracing_lock:
+        if _tracing_profiles == 0: tracemalloc.start()
+        _tracing_profiles += 1
+
+def _stop_tracing():
+    global _tracing_profiles
+    with _tracing_lock:
+        _tracing_profiles -= 1
+        if _tracing_profiles == 0: tracemalloc.stop()
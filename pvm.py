@@ -0,0 +1,75 @@
+from profiling import profiled
+
+# Price-volume-mix decomposition of the revenue change in delta_data, at any level of the channel and product
+# hierarchies. Every leaf row (month x customer x SKU) is reduced to five additive sums: revenue and quantity in both
+# years, and the current quantity at prior-year prices. Any group's effects follow from its sums alone:
+#   price  = current revenue - current quantity at prior prices      (sum of Q1 x (P1 - P0) over the leaves)
+#   volume = (Q1 - Q0) x the group's prior average price
+#   mix    = the rest of the revenue change: the shift in the leaves' quantity shares, valued at prior prices
+# so price + volume + mix is exactly the revenue change at every level, and percentages are of prior-year revenue
+# (weighted, not a mean of row percentages). A leaf sold in one year only has no price effect: a new one is valued
+# at its current price, so its revenue counts as volume and mix.
+# All grouping sets are rolled up from one groupby at their finest common grain, like SQL GROUPING SETS.
+
+
+HIERARCHIES = {
+    "channel": ["Channel Category", "Channel Sub-Category", "Customer Name"],
+    "product": ["Product Category", "Product Family", "Product Range", "Product SKU"],
+}
+
+# The total and every level of both hierarchies
+GROUPING_SETS = [()] + [tuple(levels[:depth]) for levels in HIERARCHIES.values() for depth in range(1, len(levels) + 1)]
+
+SUMS = ["Revenue Prior", "Revenue Current", "QTY Prior", "QTY Current", "QTY Current at Prior Price"]
+EFFECTS = ["Delta Price", "Delta Volume", "Delta Mix"]
+
+
+def delta_years(df):
+    """(prior, current) year of a delta_data frame, from its Revenue_<year> columns."""
+    years = sorted(int(column.rsplit("_", 1)[1]) for column in df.columns if column.startswith("Revenue_"))
+    return years[0], years[-1]
+
+def revenue_columns(df):
+    """The prior and current year's revenue columns of a delta_data frame, e.g. ['Revenue_2022', 'Revenue_2023']."""
+    return [f"Revenue_{year}" for year in delta_years(df)]
+
+def leaf_sums(df):
+    """The five additive sums of each delta row (a year the row's leaf didn't sell in counts as zero)."""
+    import numpy as np
+    import pandas as pd
+    prior, current = delta_years(df)
+    r0, r1 = (df[f"Revenue_{year}"].fillna(0).to_numpy(dtype=float) for year in (prior, current))
+    q0, q1 = (df[f"QTY [Units]_{year}"].fillna(0).to_numpy(dtype=float) for year in (prior, current))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prior_price = np.where(q0 > 0, r0 / q0, np.where(q1 > 0, r1 / q1, 0.0))
+    return pd.DataFrame(dict(zip(SUMS, [r0, r1, q0, q1, q1 * prior_price])), index=df.index)
+
+def effects(sums):
+    """Add the price, volume and mix effects ([CAD] and % of prior revenue) to a frame of summed leaves."""
+    import numpy as np
+    r0, q0, q1, at_prior = (sums[column].to_numpy() for column in ["Revenue Prior", "QTY Prior", "QTY Current", "QTY Current at Prior Price"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume = np.where(q0 > 0, (q1 - q0) * r0 / q0, at_prior - r0)
+        values = {"Delta Price": sums["Revenue Current"].to_numpy() - at_prior, "Delta Volume": volume,
+                  "Delta Mix": at_prior - r0 - volume}
+        for effect in EFFECTS:
+            sums[f"{effect} [CAD]"] = values[effect]
+            sums[f"{effect} %"] = np.where(r0 != 0, values[effect] / r0 * 100, np.nan)
+    return sums
+
+@profiled
+def rollup(df, grouping_sets=GROUPING_SETS):
+    """{grouping set: its groups' sums and effects} for delta rows `df`; the empty set is the one-row total."""
+    import pandas as pd
+    finest = list(dict.fromkeys(key for grouping_set in grouping_sets for key in grouping_set))
+    base = leaf_sums(df)
+    if finest:
+        base = base.groupby([df[key] for key in finest], sort=False, observed=True).sum().reset_index()
+    levels = {}
+    for grouping_set in grouping_sets:
+        if grouping_set:
+            sums = base.groupby(list(grouping_set), sort=True, observed=True)[SUMS].sum().reset_index()
+        else:
+            sums = pd.DataFrame([base[SUMS].sum()])
+        levels[grouping_set] = effects(sums)
+    return levels
@@ -0,0 +1,48 @@
+import streamlit as st
+
+from profiling import profiled, profiled_cache
+
+# Top-N rankings for the Overview. The index holds partial sums per (YEAR, MONTH) at the finest level each ranking
+# can drill into, built once per dataset version by the compute backend; a top-N for any month selection, measure,
+# N or drill-down is then merged from those partials (a few thousand rows) instead of a groupby over the raw rows.
+
+
+# Ranked dimension -> the dimension a click on one of its bars drills into
+# (customers drill into the product ranges they buy: each customer has a single sub-channel)
+LEVELS = {"Customer Name": "Product Range", "Product Range": "Product SKU"}
+
+# Measure -> the summed user_data column. "Delta" ranks by the change in revenue from the same months of the prior year.
+MEASURES = {"Revenue": "Revenue", "GM": "Total GM [CAD]", "Quantity": "QTY [Units]", "Delta": "Revenue"}
+
+
+@profiled_cache(st.cache_resource, max_entries=4)
+def get_ranking_index(data_key, _source):
+    """The ranking index of a users source, cached on its key (see utils.get_source)."""
+    return build_index(_source)
+
+@profiled
+def build_index(source):
+    """{dimension: partial sums of every measure by YEAR, MONTH, dimension and its drill-down dimension}."""
+    from backends import as_query
+    aggregations = {column: "sum" for column in set(MEASURES.values())}
+    return {dimension: as_query(source).aggregate(by=["YEAR", "MONTH", dimension, child], aggregations=aggregations)
+            for dimension, child in LEVELS.items()}
+
+@profiled
+def top_n(index, dimension, year, months, n, measure, parent=None):
+    """
+    The `n` largest `dimension` values by `measure` over `months` of `year`, as a frame of the value and the measure.
+    With `parent` (a value of `dimension`), rank that value's drill-down dimension instead.
+    """
+    partials = index[dimension]
+    key = dimension
+    if parent is not None:
+        partials = partials[partials[dimension] == parent]
+        key = LEVELS[dimension]
+    partials = partials[partials["MONTH"].isin(months)]
+
+    def total(in_year):
+        return partials[partials["YEAR"] == in_year].groupby(key)[MEASURES[measure]].sum()
+
+    values = total(year).sub(total(year - 1), fill_value=0) if measure == "Delta" else total(year)
+    return values.nlargest(n).rename(measure).rename_axis(key).reset_index()
@@ -0,0 +1,148 @@
+import argparse
+import glob
+import os
+import time
+
+# Shared dataset store for running several Streamlit workers on one host. One loader process
+# (`python shared_store.py`) reads the datasets from DATA_SOURCE (MongoDB by default, see sources.py) and publishes
+# each as an uncompressed Arrow IPC file in SHARED_STORE (a tmpfs such as /dev/shm/aitionics). Workers memory-map the
+# current version read-only, so the numeric columns are views of the same physical pages in every worker instead of
+# one copy each; string columns are still built per worker (pandas 1.5 has no shared string layout), with every
+# distinct string stored once.
+#
+# Layout: <name>-<version>.arrow plus <name>.current, which holds the current version number. A refresh writes the
+# next version, then swaps the pointer with os.replace, so readers see either the old or the new version, never a
+# half-written file. Only the previous version is kept besides the current one; a worker still mapping an older file
+# keeps its pages until it unmaps it (an unlinked file lives on while mapped).
+
+
+def store_dir():
+    return os.environ.get("SHARED_STORE")
+
+def pointer_path(name):
+    return os.path.join(store_dir(), f"{name}.current")
+
+def version_path(name, version):
+    return os.path.join(store_dir(), f"{name}-{version}.arrow")
+
+def current_version(name):
+    """The published version of dataset `name`, or None if it hasn't been published."""
+    try:
+        with open(pointer_path(name)) as pointer:
+            return int(pointer.read())
+    except FileNotFoundError:
+        return None
+
+def generation(name, version):
+    """The identity of the file holding a version: a store rebuilt from scratch reuses version numbers, not files."""
+    stat = os.stat(version_path(name, version))
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def to_table(df):
+    """
+    The frame as an Arrow table, with the columns of each dtype next to each other (see read_frame); float NaNs stay
+    values rather than nulls, so the columns map without a copy.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    groups = {}
+    for column, dtype in df.dtypes.items():
+        groups.setdefault(str(dtype), []).append(column)
+    columns = {column: pa.array(df[column].to_numpy(), from_pandas=not pd.api.types.is_float_dtype(df[column]))
+               for group in groups.values() for column in group}
+    return pa.table(columns)
+
+def publish(df, name):
+    """Write `df` as the next version of dataset `name`, swap the pointer to it and prune older versions."""
+    import pyarrow as pa
+    os.makedirs(store_dir(), exist_ok=True)
+    version = (current_version(name) or 0) + 1
+    path = version_path(name, version)
+    table = to_table(df)
+    with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(f"{path}.tmp", path)
+    with open(f"{pointer_path(name)}.tmp", "w") as pointer:
+        pointer.write(str(version))
+    os.replace(f"{pointer_path(name)}.tmp", pointer_path(name))
+    for old in glob.glob(os.path.join(store_dir(), f"{name}-*.arrow")):
+        if int(old.rsplit("-", 1)[1].split(".")[0]) < version - 1:
+            os.remove(old)
+    return version
+
+def read_table(name, version):
+    """Memory-map version `version` of dataset `name` as an Arrow table (no data is read until it is used)."""
+    import pyarrow as pa
+    return pa.ipc.open_file(pa.memory_map(version_path(name, version))).read_all()
+
+def mapped_block(table, columns):
+    """
+    The values of numeric columns of one type as a read-only 2D array, one row per column: a view of the mapping when
+    they are one run of the file, else a copy (a column with nulls or padding after its values).
+    """
+    import numpy as np
+    import pyarrow as pa
+    dtype = np.dtype(table.schema.field(columns[0]).type.to_pandas_dtype())
+    size = table.num_rows * dtype.itemsize
+    chunks = [table.column(column).chunks for column in columns]
+    buffers = [chunk[0].buffers()[1] for chunk in chunks
+               if len(chunk) == 1 and chunk[0].null_count == 0 and chunk[0].offset == 0]
+    if size and len(buffers) == len(columns) and all(
+            buffer.address == buffers[0].address + position * size for position, buffer in enumerate(buffers)):
+        run = pa.foreign_buffer(buffers[0].address, size * len(columns), base=table)
+        values = np.frombuffer(run, dtype).reshape(len(columns), table.num_rows)
+    else:
+        values = np.stack([table.column(column).to_numpy() for column in columns])
+    values.flags.writeable = False
+    return values
+
+def read_frame(name, version):
+    """
+    The mapped version as a pandas frame whose numeric columns are zero-copy, read-only views of the mapping. Arrow
+    writes a column's values right after the previous column's, so the columns of a type that to_table put next to
+    each other are one run of the file, viewed as one 2D block: pandas sees one block per dtype, as in a consolidated
+    frame, and never merges them into a private copy.
+    """
+    import pyarrow as pa
+    from utils import block_frame
+    table = read_table(name, version)
+    groups = {}
+    for field in table.schema:
+        numeric = pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+        groups.setdefault(field.type if numeric else None, []).append(field.name)
+    blocks = [table.select(columns).to_pandas(deduplicate_objects=True) if kind is None
+              else (columns, mapped_block(table, columns)) for kind, columns in groups.items()]
+    return block_frame(blocks)
+
+
+# ------------------------------- LOADER -------------------------------
+def data_hash(df):
+    import pandas as pd
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the MongoDB collections to the shared store.")
+    parser.add_argument("names", nargs="*", default=["users", "delta"])
+    parser.add_argument("--interval", type=float, help="refresh every INTERVAL seconds instead of publishing once")
+    args = parser.parse_args()
+    if not store_dir():
+        parser.error("set SHARED_STORE to the store directory, e.g. /dev/shm/aitionics")
+
+    from utils import fetch_data, load_dataset
+    published = {}  # name -> hash of the published data; unchanged data keeps its version (and the workers' caches)
+    while True:
+        load_dataset.clear()
+        for name in args.names:
+            df = fetch_data(name)
+            digest = data_hash(df)
+            if published.get(name) != digest:
+                print(f"published {name} version {publish(df, name)}: {len(df):,} rows", flush=True)
+                published[name] = digest
+        if args.interval is None:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
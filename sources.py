@@ -0,0 +1,181 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import MONTHS_ORDER
+
+# Data sources for the datasets 'users' and 'delta'. A source reads a dataset into a frame; utils.load_dataset caches
+# it per (source key, dataset) after `typed_frame` has given it the dtypes every page expects, so the pages and compute
+# backends can't tell where the data came from.
+#   mongo   the MongoDB collections (the default)
+#   files   <name>.parquet or <name>.feather in DATA_DIR, for running offline without a database
+#   upload  a CSV, XLS or XLSX extract of user_data uploaded in the sidebar, for the uploading session only; its delta
+#           data is built from it as the Data Processing notebook does (see utils.build_delta_data). The file is
+#           ingested in the background in chunks of UPLOAD_CHUNK_ROWS rows (see Ingest), so the session stays
+#           responsive and the raw parse of the whole file is never in memory at once.
+# DATA_SOURCE selects "mongo" or "files" for the whole app; an upload replaces it for its session.
+
+
+SOURCES = ("mongo", "files")
+
+# Label columns stay strings; every other column except YEAR is numeric
+LABELS = ["MONTH", "Customer Code", "Customer Name", "Channel Category", "Channel Sub-Category", "Product SKU",
+          "Product Description", "Product Range", "Product Family", "Product Category"]
+
+# Discount rates a row without that discount leaves empty (the notebook fills them with 0)
+DISCOUNT_COLUMNS = ["Standard Discount [SD2 %]", "Special Discount [DSP %]", "Promo Campaign [DPR%]", "Rebates [DREB%]"]
+
+
+def typed_frame(df):
+    """
+    Normalize a frame the way the Data Processing notebook does: empty discount rates are 0, months are three-letter
+    names ('April' and 'Sept' become 'Apr' and 'Sep'), YEAR is an integer and every other non-label column is a float,
+    with unparseable values as NaN. Columns that already have the right dtype are left as they are. The frame given is
+    not modified (an uploaded one is shared by every session reading it): the result is a shallow copy whose changed
+    columns are replaced, never written into.
+    """
+    import pandas as pd
+    df = df.drop(columns=["_id"]) if "_id" in df.columns else df.copy(deep=False)
+    for column in df.columns:
+        if column in LABELS:
+            if df[column].dtype != object:  # e.g. numeric customer codes read from a CSV
+                df[column] = df[column].astype(object).where(df[column].isna(), df[column].astype(str))
+        elif column == "YEAR":
+            if df[column].dtype.kind != "i":
+                df[column] = pd.to_numeric(df[column], errors="coerce")
+        elif df[column].dtype != "float64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    if "YEAR" in df.columns and df["YEAR"].dtype.kind == "f" and df["YEAR"].notna().all():
+        df["YEAR"] = df["YEAR"].astype("int64")
+    if "MONTH" in df.columns and not df["MONTH"].isin(MONTHS_ORDER).all():
+        canonical = df["MONTH"].str.strip().str[:3].str.title()
+        df["MONTH"] = canonical.where(canonical.isin(MONTHS_ORDER), df["MONTH"])
+    filled = [column for column in DISCOUNT_COLUMNS if column in df.columns and df[column].isna().any()]
+    if filled:
+        df[filled] = df[filled].fillna(0)
+    return df
+
+def configured_source():
+    """The app-wide source set by DATA_SOURCE."""
+    source = os.environ.get("DATA_SOURCE", "mongo")
+    if source == "mongo":
+        return MongoSource()
+    if source == "files":
+        return FileSource(os.environ.get("DATA_DIR", "data"))
+    raise ValueError(f"unknown DATA_SOURCE {source!r}, expected one of {SOURCES}")
+
+
+# ------------------------------- MONGO -------------------------------
+class MongoSource:
+    key = ("mongo",)
+
+    def read(self, name):
+        from utils import read_collection
+        return read_collection(name)
+
+
+# ------------------------------- FILES -------------------------------
+class FileSource:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, name):
+        for extension in (".parquet", ".feather"):
+            path = os.path.join(self.directory, f"{name}{extension}")
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"no {name}.parquet or {name}.feather in {self.directory}")
+
+    @property
+    def key(self):
+        # A rewritten file gets a new key, so the cached frames are reread
+        files = sorted((entry.name, entry.stat().st_mtime_ns) for entry in os.scandir(self.directory)
+                       if entry.name.endswith((".parquet", ".feather")))
+        return ("files", self.directory, tuple(files))
+
+    def read(self, name):
+        import pandas as pd
+        path = self.path(name)
+        return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_feather(path)
+
+
+# ------------------------------- UPLOAD -------------------------------
+UPLOAD_CHUNK_ROWS = int(os.environ.get("UPLOAD_CHUNK_ROWS", 50_000))
+
+# Ingestion gets a single thread of its own, like the chart warm-ups: uploads queue up rather than compete for the CPU
+_ingest_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+
+def upload_chunks(filename, content):
+    """Parse an uploaded CSV, XLSX or XLS file in chunks of UPLOAD_CHUNK_ROWS rows, yielding (chunk, fraction read)."""
+    import pandas as pd
+    labels = {column: str for column in LABELS}  # codes like 00123 keep their leading zeros
+    if filename.lower().endswith(".csv"):
+        stream = io.BytesIO(content)
+        for chunk in pd.read_csv(stream, dtype=labels, chunksize=UPLOAD_CHUNK_ROWS):
+            yield chunk, stream.tell() / max(len(content), 1)
+    elif filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        sheet = load_workbook(io.BytesIO(content), read_only=True, data_only=True).worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(name) for name in next(rows)]
+        total, read, batch = max((sheet.max_row or 1) - 1, 1), 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == UPLOAD_CHUNK_ROWS:
+                read += len(batch)
+                yield pd.DataFrame.from_records(batch, columns=header), min(read / total, 1.0)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=header), 1.0
+    else:  # .xls: xlrd has no streaming reader
+        yield pd.read_excel(io.BytesIO(content), dtype=labels), 1.0
+
+def share_strings(df):
+    """Make equal labels one string object, so each label costs a pointer per row rather than a string per row."""
+    import pandas as pd
+    for column in df.columns:
+        if df[column].dtype == object:
+            codes, uniques = pd.factorize(df[column])
+            df[column] = pd.Series(uniques.take(codes), index=df.index, dtype=object).where(codes >= 0)
+    return df
+
+class Ingest:
+    """
+    The background ingestion of an uploaded file: each chunk is normalized with typed_frame as soon as it is parsed,
+    then the chunks are concatenated into one compact typed frame. Sessions poll `progress` and `done`.
+    """
+    def __init__(self, filename, content, digest):
+        self.filename = filename
+        self.key = ("upload", digest)
+        self.progress = 0.0
+        self.rows = 0
+        self.future = _ingest_pool.submit(self.run, content)
+
+    def run(self, content):
+        import pandas as pd
+        chunks = []
+        for chunk, progress in upload_chunks(self.filename, content):
+            chunks.append(typed_frame(chunk))
+            self.rows += len(chunk)
+            self.progress = progress
+        return share_strings(pd.concat(chunks, ignore_index=True))
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def source(self):
+        """The ingested file as a source; raises the ingestion's error if it failed."""
+        return UploadSource(self.key, self.future.result())
+
+class UploadSource:
+    def __init__(self, key, users):
+        self.key = key
+        self.users = users
+
+    def read(self, name):
+        if name == "delta":
+            from utils import build_delta_data
+            return build_delta_data(self.users, year=int(self.users["YEAR"].max()))
+        return self.users
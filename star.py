@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+# Star schema for the "star" compute backend (see backends.py). A dataset is split into small dimension tables and
+# an integer-coded fact table:
+#   product   one row per SKU with its Description, Range, Family and Category (the product tree, one path per row)
+#   customer  one row per customer with its Code, Sub-Channel and Channel (the channel tree)
+#   every other string column (MONTH, ...) becomes a one-column dimension of its distinct values
+# The facts keep each row's dimension keys (int32) and the numeric columns. A filter on any label resolves to a key
+# set on its dimension table and is applied to the facts by indexing a boolean array with the keys; distinct values
+# are read off the dimension rows the filtered keys point to; groupbys run on integer codes. Labels are joined back
+# only on aggregates and on the rows handed to the chart builders.
+
+
+DIMENSIONS = {
+    "product": ["Product SKU", "Product Description", "Product Range", "Product Family", "Product Category"],
+    "customer": ["Customer Code", "Customer Name", "Channel Sub-Category", "Channel Category"],
+}
+
+
+def build_star(df):
+    """
+    Split a frame into {"facts", "dimensions", "attributes", "codes", "columns"}: the fact table, the dimension
+    tables by name, the dimension of each label column, each label column's codes (-1 for a missing label) and
+    distinct labels over its dimension's rows, and the frame's column order.
+    """
+    facts, dimensions, attributes = {}, {}, {}
+    for name, columns in DIMENSIONS.items():
+        columns = [column for column in columns if column in df.columns]
+        if columns:
+            keys = number_rows(df, columns)
+            first_rows = np.unique(keys, return_index=True)[1]  # keys are numbered in order of first appearance
+            dimensions[name] = df[columns].iloc[first_rows].reset_index(drop=True)
+            facts[f"{name} key"] = keys.astype(np.int32)
+            attributes.update(dict.fromkeys(columns, name))
+    for column in df.columns:
+        if column not in attributes and df[column].dtype == object:
+            codes, labels = pd.factorize(df[column], use_na_sentinel=False)
+            dimensions[column] = pd.DataFrame({column: labels})
+            facts[f"{column} key"] = codes.astype(np.int32)
+            attributes[column] = column
+        elif column not in attributes:
+            facts[column] = df[column].to_numpy()
+    codes = {}
+    for column, name in attributes.items():
+        label_codes, labels = pd.factorize(dimensions[name][column])
+        codes[column] = (label_codes, np.asarray(labels, dtype=object))
+    return {"facts": pd.DataFrame(facts), "dimensions": dimensions, "attributes": attributes, "codes": codes,
+            "columns": list(df.columns)}
+
+
+def number_rows(df, columns):
+    """Number the distinct combinations of `columns` (missing values included) in order of first appearance."""
+    keys = np.zeros(len(df), dtype=np.int64)
+    for column in columns:
+        codes, labels = pd.factorize(df[column], use_na_sentinel=False)
+        keys = pd.factorize(keys * len(labels) + codes)[0]
+    return keys
+
+
+class StarQuery:
+    def __init__(self, star, key, mask=None):
+        self.star = star
+        self.key = key
+        self.mask = mask
+        self._rows = None
+
+    def dimension_keys(self, column):
+        """The fact rows' keys into the dimension holding `column`, or None for a numeric fact column."""
+        dimension = self.star["attributes"].get(column)
+        return None if dimension is None else self.star["facts"][f"{dimension} key"].to_numpy()
+
+    def where(self, column, value):
+        """Keep the rows where `column` equals `value`, or is in `value` if it is a tuple."""
+        keys = self.dimension_keys(column)
+        if keys is None:
+            values = self.star["facts"][column]
+        else:
+            values = self.star["dimensions"][self.star["attributes"][column]][column]
+        matches = values.isin(value) if isinstance(value, tuple) else values == value
+        condition = matches.to_numpy() if keys is None else matches.to_numpy()[keys]  # the key set, applied to the facts
+        return StarQuery(self.star, self.key, condition if self.mask is None else self.mask & condition)
+
+    def distinct(self, column):
+        keys = self.dimension_keys(column)
+        if keys is None:
+            values = self.star["facts"][column]
+            return (values if self.mask is None else values[self.mask]).unique()
+        present = pd.unique(keys if self.mask is None else keys[self.mask])
+        labels = self.star["dimensions"][self.star["attributes"][column]][column].to_numpy()
+        return pd.unique(labels[present])
+
+    def count(self):
+        return len(self.star["facts"]) if self.mask is None else int(self.mask.sum())
+
+    def fact_column(self, column):
+        """A fact column (a numeric column or a dimension's keys) for the matching rows, as an array."""
+        values = self.star["facts"][column].to_numpy()
+        return values if self.mask is None else values[self.mask]
+
+    def aggregate(self, by, aggregations):
+        """Group by the `by` columns' integer codes and reduce each column of `aggregations` ({column: "sum" or "mean"})."""
+        attributes = self.star["attributes"]
+        coded = [column for column in by if column in attributes]
+        grouped = {column: self.star["codes"][column][0][self.fact_column(f"{attributes[column]} key")] if column in coded
+                   else self.fact_column(column) for column in by}
+        frame = pd.DataFrame({**grouped, **{column: self.fact_column(column) for column in aggregations}})
+        if coded:
+            frame = frame[(frame[coded] >= 0).all(axis=1)]  # rows with a missing label fall out, as in pandas' groupby
+        result = frame.groupby(by, sort=False).agg(**{column: (column, func) for column, func in aggregations.items()})
+        result = result.reset_index()
+        for column in coded:
+            result[column] = self.star["codes"][column][1][result[column].to_numpy()]
+        return result.sort_values(by).reset_index(drop=True)
+
+    def rows(self, columns=None):
+        """The matching rows with their labels joined back, in the dataset's column order."""
+        if self.mask is None and "rows" in self.star:
+            return self.star["rows"]
+        if self._rows is None:
+            columns = {}
+            for column in self.star["columns"]:
+                dimension = self.star["attributes"].get(column)
+                if dimension is None:
+                    columns[column] = self.fact_column(column)
+                else:
+                    labels = self.star["dimensions"][dimension][column].to_numpy()
+                    columns[column] = labels[self.fact_column(f"{dimension} key")]
+            index = None if self.mask is None else np.flatnonzero(self.mask)
+            self._rows = pd.DataFrame(columns, index=index)
+            if self.mask is None:  # the unfiltered rows are the same for every session: share them, frozen
+                from utils import freeze_frame
+                self._rows = self.star["rows"] = freeze_frame(self._rows)
+        return self._rows
@@ -1,8 +1,16 @@
-import pymongo
-import pandas as pd
+import logging
+import os
+import time
+
 import streamlit as st
-from pymongo import MongoClient
 
+from metrics import observe_fetch
+from profiling import is_profiling, profiled, profiled_cache, record
+
+# This module is imported before the login screen draws, so pandas, numpy and pymongo are imported inside the
+# functions that use them rather than here.
+
+logger = logging.getLogger(__name__)
 
 
 MONTHS_ORDER = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
@@ -50,11 +58,20 @@ def setup_app():
 
 
 # ------------------------------- AUTHENTICATION -------------------------------
+@profiled_cache(st.cache_resource)
+def get_mongo_client():
+    """Create the MongoDB client once per process, the first time a collection is actually needed."""
+    from pymongo import MongoClient
+    return MongoClient(st.secrets["mongo"]["con_string"])
+
+def get_mongo_collection(name):
+    """Retrieve a single collection by its key in the mongo secrets ('users', 'delta' or 'auth_user')."""
+    db = get_mongo_client()[st.secrets["mongo"]["db"]]
+    return db[st.secrets["mongo"][name]]
+
 def get_mongo_collections():
     """Retrieve necessary collections from MongoDB."""
-    client = MongoClient(st.secrets["mongo"]["con_string"])
-    db = client[st.secrets["mongo"]["db"]]
-    return db[st.secrets["mongo"]["users"]], db[st.secrets["mongo"]["delta"]], db[st.secrets["mongo"]["auth_user"]]
+    return get_mongo_collection("users"), get_mongo_collection("delta"), get_mongo_collection("auth_user")
 
 def initialize_session_state():
     """Initialize the session state."""
@@ -64,11 +81,12 @@ def initialize_session_state():
 def authenticate_user(username, password):
     """Check if the user credentials are valid."""
     if username and password:
-        _, _, auth_user_collection = get_mongo_collections()
+        auth_user_collection = get_mongo_collection("auth_user")
         user_record = auth_user_collection.find_one({"name": username})
 
         # If a user with the provided username exists and the password matches, return True
         if user_record and user_record.get("password") == password:
+            st.session_state['role'] = user_record.get("role", "user")  # "admin" unlocks the profiling panel
             return True
 
     return False
@@ -89,19 +107,212 @@ def authenticate():
 def logout_user():
     """Logout the user."""
     st.session_state['authenticated'] = None
+    st.session_state.pop('role', None)
     st.rerun()
 
 
 # ------------------------------- DATA RETRIEVAL -------------------------------
 
-def collection_hasher(collection):
-    """Custom hash function for MongoDB collection objects."""
-    return hash(collection.full_name)   # Use the collection's full name as a unique identifier
+def block_frame(blocks, index=None):
+    """
+    A frame over `blocks`, each a frame taken as is or a (columns, 2D array) pair with one array row per column (the
+    layout of a pandas block), wrapped without a copy. Given one block per dtype, pandas sees the frame as consolidated
+    and never merges its blocks into new (writable) copies, e.g. the first time the frame is filtered.
+    """
+    import pandas as pd
+    frames = [block if isinstance(block, pd.DataFrame)
+              else pd.DataFrame(block[1].T, index=index, columns=block[0], copy=False) for block in blocks]
+    return pd.concat(frames, axis=1, copy=False) if frames else pd.DataFrame(index=index)
 
-@st.cache_resource(hash_funcs={pymongo.collection.Collection: collection_hasher})
-def fetch_data(collection):
-    """Fetch data from MongoDB, caching the result to enhance performance."""
-    return pd.DataFrame(list(collection.find())).drop(columns=["_id"])
+def freeze_frame(df):
+    """
+    A copy of the frame whose numeric columns are read-only, one array per dtype, so in-place writes into their values
+    (.loc, .iloc, .values) raise instead of leaking into other sessions. The columns are grouped by dtype. Other
+    (string) columns are copied as they are and stay writable: pandas 1.5's object comparisons need a writable buffer.
+    Adding or replacing a column (df["X"] = ..., df["Revenue"] = df["Revenue"] * 2) is not blocked and changes the
+    frame for every session; the benchmark suite checks that no chart builder does it.
+    """
+    import numpy as np
+    groups = {}
+    for column, dtype in df.dtypes.items():
+        numeric = isinstance(dtype, np.dtype) and dtype.kind in "biufmM"
+        groups.setdefault(dtype if numeric else None, []).append(column)
+    blocks = []
+    for dtype, columns in groups.items():
+        if dtype is None:
+            blocks.append(df[columns])
+            continue
+        values = np.ascontiguousarray(df[columns].to_numpy().T)
+        values.flags.writeable = False
+        blocks.append((columns, values))
+    return block_frame(blocks, df.index)
+
+@profiled_cache(st.cache_resource, max_entries=8)
+def load_dataset(source_key, name, _source):
+    """
+    Read a dataset by its key ('users' or 'delta') from a source (see sources.py) as a typed frame, cached on the
+    source's key. The cached frame is shared by every session, so it is frozen: derive new frames from it, never
+    assign into it.
+    """
+    from sources import typed_frame
+    return freeze_frame(typed_frame(_source.read(name)))
+
+def fetch_data(name):
+    """Fetch a dataset by its key ('users' or 'delta') from the source set by DATA_SOURCE (MongoDB by default)."""
+    from sources import configured_source
+    source = configured_source()
+    return load_dataset(source.key, name, source)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def start_ingest(digest, filename, _content):
+    """Start ingesting an uploaded file in the background, once per process for the same content (see sources.Ingest)."""
+    from sources import Ingest
+    return Ingest(filename, _content, digest)
+
+@st.fragment(run_every=1)
+def ingest_progress(ingest):
+    """Show an ingestion's progress, polling every second, and rerun the app once it has finished."""
+    if ingest.done:
+        st.rerun()
+    st.progress(ingest.progress, text=f"Reading {ingest.filename}: {ingest.rows:,} rows")
+
+def get_upload():
+    """
+    Draw the sidebar uploader and return the session's uploaded extract as a source (see sources.py) once it has been
+    ingested, or None: the pages keep showing the configured source while the file is read.
+    """
+    uploaded = st.sidebar.file_uploader("Upload data", type=["csv", "xls", "xlsx"])
+    if uploaded is None:
+        st.session_state.pop("upload", None)
+        return None
+    if st.session_state.get("upload", (None,))[0] != uploaded.file_id:  # hash the content once per file
+        import hashlib
+        content = uploaded.getvalue()
+        st.session_state["upload"] = (uploaded.file_id, start_ingest(hashlib.sha1(content).hexdigest(), uploaded.name, content))
+    ingest = st.session_state["upload"][1]
+    if not ingest.done:
+        with st.sidebar:
+            ingest_progress(ingest)
+        return None
+    try:
+        return ingest.source()
+    except Exception as error:
+        st.sidebar.error(f"Could not read {ingest.filename}: {error}", icon="🚨")
+        return None
+
+def read_collection(name):
+    """Read a collection by its key from MongoDB into a frame (uncached)."""
+    import pandas as pd
+    collection = get_mongo_collection(name)
+    start = time.perf_counter()
+    df = pd.DataFrame(list(collection.find())).drop(columns=["_id"])
+    seconds = time.perf_counter() - start
+    observe_fetch(name, seconds, len(df))
+    record(stage=f"mongo find {name}", kind="mongo", ms=round(seconds * 1000, 2), rows_out=len(df))
+    return df
+
+@profiled_cache(st.cache_resource, max_entries=8)
+def load_star(source_key, name, _source):
+    """
+    A dataset split into an integer-coded star schema (see star.py) for the "star" backend, cached on the source's key
+    like load_dataset; the raw frame isn't kept.
+    """
+    import star
+    from sources import typed_frame
+    return star.build_star(typed_frame(_source.read(name)))
+
+@profiled_cache(st.cache_resource, max_entries=4)
+def load_shared(name, version, generation):
+    """
+    Map a version of a dataset from the shared store; a new version (or a new file under an old version number, see
+    shared_store.generation) gets a new entry and the oldest is dropped. Its numeric columns are views of the
+    read-only mapping, already frozen.
+    """
+    import shared_store
+    return shared_store.read_frame(name, version)
+
+# Compound indexes maintained on each collection: the filter cascades' drill-down paths for the "mongo" backend, so a
+# narrow selection reads its documents through an index instead of scanning the collection, and the month, customer
+# and SKU of a delta row for month_close.py's upserts.
+INDEXES = {
+    "users": [
+        ["YEAR", "MONTH", "Product Category", "Product Family", "Product Range"],
+        ["YEAR", "Channel Category", "Customer Name"],
+    ],
+    "delta": [
+        ["MONTH", "Customer Code", "Product SKU"],
+    ],
+}
+
+# Seconds a "mongo" backend result is reused; the source key rolls over with it, so the derived caches follow
+MONGO_CACHE_TTL = int(os.environ.get("MONGO_CACHE_TTL", 600))
+
+@profiled_cache(st.cache_resource)
+def ensure_indexes(name):
+    """
+    Create the collection's INDEXES if they are missing (once per process) and verify they exist; returns the names of
+    those created. A user without the createIndex privilege can still read: a failure is logged and the filters scan.
+    """
+    from pymongo import ASCENDING
+    from pymongo.errors import PyMongoError
+    collection = get_mongo_collection(name)
+    names = []
+    for columns in INDEXES.get(name, []):
+        try:
+            names.append(collection.create_index([(column, ASCENDING) for column in columns]))
+        except PyMongoError as error:
+            logger.warning("could not create the index %s on %s: %r", columns, name, error)
+    existing = {tuple(field for field, _ in index["key"]) for index in collection.index_information().values()}
+    missing = [columns for columns in INDEXES.get(name, []) if tuple(columns) not in existing]
+    if missing:
+        logger.warning("%s is missing the indexes %s; filters will scan the collection", name, missing)
+    return names
+
+@profiled_cache(st.cache_data, ttl=MONGO_CACHE_TTL, max_entries=256)
+def run_pipeline(name, pipeline):
+    """Run an aggregation pipeline on a collection by its key and return the documents as a frame (see backends.MongoQuery)."""
+    import pandas as pd
+    start = time.perf_counter()
+    df = pd.DataFrame(list(get_mongo_collection(name).aggregate(pipeline, allowDiskUse=True)))
+    seconds = time.perf_counter() - start
+    observe_fetch(name, seconds, len(df))
+    record(stage=f"mongo aggregate {name}", kind="mongo", ms=round(seconds * 1000, 2), rows_out=len(df))
+    return df
+
+def get_source(name, upload=None):
+    """
+    The dataset `name` ('users' or 'delta') as a query for the compute backend set by DATA_BACKEND (see backends.py):
+    the cached frame from DATA_SOURCE for "pandas" (the default), its star schema for "star", the Parquet snapshot for
+    "polars" and "duckdb", and the MongoDB collection itself for "mongo". With SHARED_STORE set, "pandas" and "polars"
+    read the current version published there instead (see shared_store.py). A session's `upload` (see get_upload) is
+    always read with pandas.
+    """
+    import backends
+    if upload is not None:
+        return backends.PandasQuery(load_dataset(upload.key, name, upload), key=upload.key + (name,))
+    backend = os.environ.get("DATA_BACKEND", "pandas")
+    if os.environ.get("SHARED_STORE") and backend in ("pandas", "polars"):
+        import shared_store
+        version = shared_store.current_version(name)
+        if version is None:
+            raise FileNotFoundError(f"{name} is not in {shared_store.store_dir()}: publish it with `python shared_store.py`")
+        key = (name, version, shared_store.generation(name, version))
+        if backend == "pandas":
+            return backends.PandasQuery(load_shared(*key), key=key)
+        return backends.scan_shared(*key)
+    if backend == "pandas":
+        from sources import configured_source
+        source = configured_source()
+        return backends.PandasQuery(load_dataset(source.key, name, source), key=source.key + (name,))
+    if backend == "star":
+        from sources import configured_source
+        from star import StarQuery
+        source = configured_source()
+        return StarQuery(load_star(source.key, name, source), source.key + (name,))
+    if backend == "mongo":
+        ensure_indexes(name)
+        return backends.MongoQuery(name, ("mongo", name, int(time.time()) // MONGO_CACHE_TTL), run_pipeline)
+    return backends.scan_snapshot(backend, name)
 
 
 # ------------------------------- DATA PROCESSING -------------------------------
@@ -115,6 +326,28 @@ def format_currency_label(value: float) -> str:
         return f'{value / 1e3:.2f}K'
     return f'{value:.2f}'
 
+# The grain of delta_data: one row per month, customer and SKU, with its channel and product hierarchy.
+DELTA_KEYS = ['MONTH', 'Channel Category', 'Customer Code', 'Product SKU', 'Product Category', 'Product Family',
+              'Product Range', 'Channel Sub-Category', 'Customer Name']
+
+@profiled
+def build_delta_data(df, year=2023):
+    """
+    Build delta_data from user_data as the Data Processing notebook does: both years aggregated to DELTA_KEYS,
+    outer-merged, and the price/volume split of the revenue change (Delta Price = net price change x current quantity).
+    """
+    import pandas as pd
+    aggregations = {'Revenue': 'sum', 'QTY [Units]': 'sum', 'Net Price [CAD]': 'sum'}
+    current = df[df['YEAR'] == year].groupby(DELTA_KEYS, observed=True).agg(aggregations).reset_index()
+    prior = df[df['YEAR'] == year - 1].groupby(DELTA_KEYS, observed=True).agg(aggregations).reset_index()
+    delta = pd.merge(current, prior, how='outer', on=DELTA_KEYS, suffixes=(f'_{year}', f'_{year - 1}'))
+
+    delta['Delta Price [CAD]'] = (delta[f'Net Price [CAD]_{year}'] - delta[f'Net Price [CAD]_{year - 1}']) * delta[f'QTY [Units]_{year}']
+    delta['Delta Price %'] = delta['Delta Price [CAD]'] / delta[f'Revenue_{year - 1}'] * 100
+    delta['Delta Volume [CAD]'] = delta[f'Revenue_{year}'] - delta[f'Revenue_{year - 1}'] - delta['Delta Price [CAD]']
+    delta['Delta Volume %'] = delta['Delta Volume [CAD]'] / delta[f'Revenue_{year - 1}'] * 100
+    return delta
+
 
 # ------------------------------- PLOTLY CONFIGURATION -------------------------------
 def update_hover_layout(fig):
@@ -136,44 +369,56 @@ def update_hover_layout(fig):
 
 
 # ------------------------------- OVERVIEW PAGE -------------------------------
+@profiled
 def get_notification_filters(df, delta_df):
-    """Filter the data based on the selected year and month."""
-    selected_year = st.sidebar.selectbox(label="Year", options=df["YEAR"].unique(), placeholder="Select Year")
-    if selected_year - 1 >= min(df["YEAR"].unique()):
-        df_year_1 = df[df["YEAR"] == selected_year - 1]
-        df_year_2 = df[df["YEAR"] == selected_year]
+    """
+    Filter the data based on the selected year and month. Takes frames or backend queries and returns queries for the
+    prior year, the selected year and the delta data of the selected months, and the (year, months) selection.
+    """
+    from backends import as_query
+    users, delta = as_query(df), as_query(delta_df)
+    years = users.distinct("YEAR")
+    selected_year = st.sidebar.selectbox(label="Year", options=years, placeholder="Select Year")
+    if selected_year - 1 >= min(years):
+        year_1 = users.where("YEAR", to_python(selected_year) - 1)
+        year_2 = users.where("YEAR", to_python(selected_year))
     else:
         st.warning("Please select a valid year.")
         st.stop()
 
-    month_to_num = {m: i for i, m in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
-    selected_month = st.sidebar.multiselect(label="Month", options=df["MONTH"].unique(), default=df["MONTH"].unique()[0])
-    months_in_year_2 = df_year_2["MONTH"].unique()
+    months = users.distinct("MONTH")
+    selected_month = st.sidebar.multiselect(label="Month", options=months, default=months[0])
+    months_in_year_2 = year_2.distinct("MONTH")
     if len(selected_month) == 0:
         st.warning("Please select at least one month.")
         st.stop()
     elif all(item in months_in_year_2 for item in selected_month):
-        selected_month_num = [month_to_num[month] for month in selected_month]
-        df_year_1 = df_year_1[df_year_1['MONTH'].map(month_to_num).isin(selected_month_num)]
-        df_year_2 = df_year_2[df_year_2['MONTH'].map(month_to_num).isin(selected_month_num)]
-        delta_df = delta_df[delta_df['MONTH'].map(month_to_num).isin(selected_month_num)]
+        selected_month = tuple(to_python(month) for month in selected_month)
     else:
         st.warning("Please select a valid month.")
         st.stop()
 
-    return df_year_1, df_year_2, delta_df
-
-def get_notification_revenue_growth(df_1, df_2):
-    """Calculate the revenue growth."""
-    revenue_year_1 = df_1.groupby('Channel Category')['Revenue'].sum().reset_index()
-    revenue_year_2 = df_2.groupby('Channel Category')['Revenue'].sum().reset_index()
-
-    revenue_comparison = pd.merge(revenue_year_1, revenue_year_2, on='Channel Category', suffixes=('_2022', '_2023'))
-    revenue_comparison['YTD Revenue Growth'] = ((revenue_comparison['Revenue_2023'] - revenue_comparison['Revenue_2022']) / revenue_comparison['Revenue_2022']) * 100
+    return (year_1.where("MONTH", selected_month), year_2.where("MONTH", selected_month),
+            delta.where("MONTH", selected_month), (to_python(selected_year), selected_month))
 
-    overall_growth = ((revenue_comparison['Revenue_2023'].sum() - revenue_comparison['Revenue_2022'].sum()) / revenue_comparison['Revenue_2022'].sum()) * 100
-    max_growth_channel = revenue_comparison.loc[revenue_comparison['YTD Revenue Growth'].idxmax()]
-    min_growth_channel = revenue_comparison.loc[revenue_comparison['YTD Revenue Growth'].idxmin()]
+@profiled
+def get_notification_revenue_growth(index, year, month, period="YTD"):
+    """
+    Calculate the revenue growth over `period` ('MTD', 'QTD', 'YTD' or 'R12') up to `month` of `year` against the same
+    period last year, overall and per channel, from a period index (see periods.py). All three are None when the data
+    doesn't reach back to the start of last year's period, or when no channel had revenue in it.
+    """
+    from periods import covered, growth
+    if not covered(index, period, year, month):
+        return None, None, None
+    overall_growth = growth(index, None, period, year, month, 'Revenue')['Growth %'].iloc[0]
+    revenue_comparison = growth(index, 'Channel Category', period, year, month, 'Revenue').rename(
+        columns={'Growth %': 'Revenue Growth'})
+    channel_growth = revenue_comparison['Revenue Growth'].dropna()  # NaN where a channel had no revenue last year
+    if channel_growth.empty:
+        return None, None, None
+    max_growth_channel = revenue_comparison.loc[channel_growth.idxmax()]
+    min_growth_channel = revenue_comparison.loc[channel_growth.idxmin()]
 
     return overall_growth, max_growth_channel, min_growth_channel
 
@@ -189,20 +434,29 @@ def highlight_extremes(row, col, pivot_table):
         color = 'color: black'
     return [color]*len(row)
 
-def get_notification_delta(df, category):
+# The rows of the Overview's delta pivot
+NOTIFICATION_KEYS = ('MONTH', 'Channel Category', 'Channel Sub-Category', 'Customer Name')
+
+@profiled
+def get_delta_rollup(df):
+    """The price-volume-mix effects of the delta rows (a frame or backend query), in total and per pivot row."""
+    from backends import as_query
+    from pvm import rollup
+    return rollup(as_query(df).rows(), [(), NOTIFICATION_KEYS])
+
+@profiled
+def get_notification_delta(levels, category):
     """
-    Calculate the overall Delta Price and Delta Volume, then generate insights including highest and lowest records.
-    A pivot table with highlighted max (green) and min (red) values for specified categories is also returned.
+    Generate the overall Delta Price or Delta Volume ('Delta Price %' or 'Delta Volume %') and insights including
+    the highest and lowest records, from the effects rolled up by get_delta_rollup. Percentages are of prior-year
+    revenue, so the overall figure is the revenue-weighted one. A pivot table with highlighted max (green) and min
+    (red) values for the category is also returned.
     """
-    pivot_table = pd.pivot_table(
-        df,
-        index=['MONTH','Channel Category', 'Channel Sub-Category', 'Customer Name'],
-        values=['Delta Price [CAD]', 'Delta Volume [CAD]', 'Delta Price %', 'Delta Volume %'],
-        aggfunc={'Delta Price [CAD]': 'sum', 'Delta Volume [CAD]': 'sum', 'Delta Price %': 'mean', 'Delta Volume %': 'mean'}
-    ).reset_index(drop=False)
+    columns = [f'{effect} {unit}' for effect in ['Delta Price', 'Delta Volume', 'Delta Mix'] for unit in ['%', '[CAD]']]
+    pivot_table = levels[NOTIFICATION_KEYS][list(NOTIFICATION_KEYS) + columns]
 
     insights = {
-        'overall_delta_pct': pivot_table[category].mean(),
+        'overall_delta_pct': levels[()][category].iloc[0],
         'highest_delta_pct': pivot_table.loc[pivot_table[category].idxmax(), category],
         'lowest_delta_pct': pivot_table.loc[pivot_table[category].idxmin(), category],
     }
@@ -223,94 +477,119 @@ def get_notification_delta(df, category):
     return insights
 
 
-# ------------------------------- PRICE ANALYSIS PAGE -------------------------------
-def get_price_filters(df):
-    """Filter the price data based on the selected filters."""
-    year = st.sidebar.selectbox(label="Year", options=df["YEAR"].unique())
-    df_filtered = df[df["YEAR"] == year]
-
-    months = st.sidebar.multiselect(label="Month", options=df_filtered["MONTH"].unique(), placeholder="All")
-    if months: df_filtered = df_filtered[df_filtered["MONTH"].isin(months)]
-
-    category = st.sidebar.selectbox(label="Product Category", options=df_filtered["Product Category"].unique())
-    df_filtered = df_filtered[df_filtered["Product Category"] == category]
-
-    family = st.sidebar.selectbox(label="Product Family", options=df_filtered["Product Family"].unique())
-    df_filtered = df_filtered[df_filtered["Product Family"] == family]
+# ------------------------------- FILTER CASCADES -------------------------------
+# A page's filters are a list of steps. Each step narrows a backend query over the shared dataset (see backends.py) and
+# offers only the values still present in the selected rows; the rows are materialized once, at the end. Steps are
+# plain data so the same cascade can be drawn in the sidebar or resolved headlessly to the widgets' defaults (see
+# `default_choice`).
+@profiled
+def apply_filters(df, steps, choose, columns=None):
+    """
+    Walk a filter cascade. `choose(step, options)` returns the selected value (selectbox) or values (multiselect)
+    for each step; an empty selection leaves the step unfiltered. `df` is a frame or a backend query. Returns the
+    filtered frame, with at least `columns` (every column when None, see backends.py), and the selection, as a
+    hashable tuple of (column, value) pairs.
+    """
+    from backends import as_query
+    query = as_query(df)
+    selection = []
+    profiling = is_profiling(detailed=True)  # counting rows is a query of its own on out-of-core backends
+    for step in steps:
+        column = step["column"]
+        rows_in = query.count() if profiling else None
+        value = choose(step, query.distinct(column))
+        if step["widget"] == "multiselect":
+            value = tuple(to_python(item) for item in value)
+            if value: query = query.where(column, value)
+        elif value is not None:
+            value = to_python(value)
+            query = query.where(column, value)
+        selection.append((column, value))
+        if profiling: record(stage=f"filter {column}", kind="filter", rows_in=rows_in, rows_out=query.count())
+    return query.rows(columns), tuple(selection)
+
+def to_python(value):
+    """Unwrap NumPy scalars so a headless selection and the widget's (plain Python) value hash alike."""
+    return value.item() if hasattr(value, "item") else value
+
+def sidebar_choice(step, options):
+    """Draw the step's widget in the sidebar and return its value."""
+    kwargs = {"placeholder": step["placeholder"]} if "placeholder" in step else {}
+    if step["widget"] == "multiselect":
+        return st.sidebar.multiselect(label=step["label"], options=options, default=options[:step.get("default_first", 0)], **kwargs)
+    return st.sidebar.selectbox(label=step["label"], options=options, **kwargs)
+
+def default_choice(step, options):
+    """Return the value the step's widget shows before any interaction, without drawing it."""
+    if step["widget"] == "multiselect":
+        return options[:step.get("default_first", 0)]
+    return options[0] if len(options) else None
 
-    product_range = st.sidebar.selectbox(label="Product Range", options=df_filtered["Product Range"].unique())
-    df_filtered = df_filtered[df_filtered["Product Range"] == product_range]
 
-    product_description = st.sidebar.selectbox(label="Product Description", options=df_filtered["Product Description"].unique())
-    df_filtered = df_filtered[df_filtered["Product Description"] == product_description]
+# ------------------------------- PRICE ANALYSIS PAGE -------------------------------
+PRICE_FILTERS = [
+    {"column": "YEAR", "label": "Year", "widget": "selectbox"},
+    {"column": "MONTH", "label": "Month", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Product Category", "label": "Product Category", "widget": "selectbox"},
+    {"column": "Product Family", "label": "Product Family", "widget": "selectbox"},
+    {"column": "Product Range", "label": "Product Range", "widget": "selectbox"},
+    {"column": "Product Description", "label": "Product Description", "widget": "selectbox"},
+]
 
-    return df_filtered
+def get_price_filters(df):
+    """Filter the price data based on the selected filters."""
+    return apply_filters(df, PRICE_FILTERS, sidebar_choice)[0]
 
 
 # ------------------------------- CUSTOMER INSIGHTS PAGE -------------------------------
+CUSTOMER_FILTERS = [
+    {"column": "YEAR", "label": "Year", "widget": "selectbox"},
+    {"column": "MONTH", "label": "Month", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Customer Name", "label": "Customer Name", "widget": "multiselect", "placeholder": "All", "default_first": 5},
+    {"column": "Product Family", "label": "Product Family", "widget": "selectbox", "placeholder": "All"},
+    {"column": "Product Range", "label": "Product Range", "widget": "multiselect"},
+    {"column": "Channel Category", "label": "Channel", "widget": "selectbox"},
+]
+
 def get_customer_filters(df):
     """Filter the customer data based on the selected filters."""
-    year = st.sidebar.selectbox(label="Year", options=df["YEAR"].unique())
-    df_filtered = df[df["YEAR"] == year]
-
-    months = st.sidebar.multiselect(label="Month", options=df_filtered["MONTH"].unique(), placeholder="All")
-    if months: df_filtered = df_filtered[df_filtered["MONTH"].isin(months)]
-
-    cust_name = st.sidebar.multiselect(label="Customer Name", options=df_filtered["Customer Name"].unique(), placeholder="All", default=df_filtered["Customer Name"].unique()[:5])
-    if cust_name: df_filtered = df_filtered[df_filtered["Customer Name"].isin(cust_name)]
-
-    family = st.sidebar.selectbox(label="Product Family", options=df_filtered["Product Family"].unique(), placeholder="All")
-    if family: df_filtered = df_filtered[df_filtered["Product Family"] == family]
-
-    product_range = st.sidebar.multiselect(label="Product Range", options=df_filtered["Product Range"].unique())
-    if product_range: df_filtered = df_filtered[df_filtered["Product Range"].isin(product_range)]
-
-    channel = st.sidebar.selectbox(label="Channel", options=df_filtered["Channel Category"].unique())
-    df_filtered = df_filtered[df_filtered["Channel Category"] == channel]
-
-    return df_filtered
+    return apply_filters(df, CUSTOMER_FILTERS, sidebar_choice)[0]
 
 
 # ------------------------------- PRODUCT PERFORMANCE PAGE -------------------------------
+PRODUCT_FILTERS = [
+    {"column": "YEAR", "label": "Year", "widget": "selectbox"},
+    {"column": "Product Category", "label": "Product Category", "widget": "selectbox"},
+    {"column": "Product Family", "label": "Product Family", "widget": "selectbox"},
+    {"column": "Product Range", "label": "Product Range", "widget": "selectbox"},
+    {"column": "Product Description", "label": "Product Description", "widget": "selectbox"},
+]
+
 def get_product_filters(df):
     """Filter the product data based on the selected filters."""
-    year = st.sidebar.selectbox(label="Year", options=df["YEAR"].unique())
-    df_filtered = df[df["YEAR"] == year]
-
-    category = st.sidebar.selectbox(label="Product Category", options=df_filtered["Product Category"].unique())
-    df_filtered = df_filtered[df_filtered["Product Category"] == category]
-
-    family = st.sidebar.selectbox(label="Product Family", options=df_filtered["Product Family"].unique())
-    df_filtered = df_filtered[df_filtered["Product Family"] == family]
-
-    product_range = st.sidebar.selectbox(label="Product Range", options=df_filtered["Product Range"].unique())
-    df_filtered = df_filtered[df_filtered["Product Range"] == product_range]
-
-    product_description = st.sidebar.selectbox(label="Product Description", options=df_filtered["Product Description"].unique())
-    df_filtered = df_filtered[df_filtered["Product Description"] == product_description]
-
-    return df_filtered
+    return apply_filters(df, PRODUCT_FILTERS, sidebar_choice)[0]
 
 
 # ------------------------------- SUMMARY PAGE -------------------------------
+SUMMARY_FILTERS = [
+    {"column": "Product Category", "label": "Product Category", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Product Family", "label": "Product Family", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Product Range", "label": "Product Range", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Channel Category", "label": "Channel Category", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Channel Sub-Category", "label": "Channel Sub-Category", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Customer Name", "label": "Customer Name", "widget": "multiselect", "placeholder": "All"},
+]
+
 def get_summary_filters(df):
     """Filter the delta data based on the selected filters."""
-    category = st.sidebar.multiselect(label="Product Category", options=df["Product Category"].unique(), placeholder="All")
-    if category: df = df[df["Product Category"].isin(category)]
-
-    family = st.sidebar.multiselect(label="Product Family", options=df["Product Family"].unique(), placeholder="All")
-    if family: df = df[df["Product Family"].isin(family)]
+    return apply_filters(df, SUMMARY_FILTERS, sidebar_choice)[0]
 
-    product_range = st.sidebar.multiselect(label="Product Range", options=df["Product Range"].unique(), placeholder="All")
-    if product_range: df = df[df["Product Range"].isin(product_range)]
 
-    ch_category = st.sidebar.multiselect(label="Channel Category", options=df["Channel Category"].unique(), placeholder="All")
-    if ch_category: df = df[df["Channel Category"].isin(ch_category)]
-
-    ch_sub_category = st.sidebar.multiselect(label="Channel Sub-Category", options=df["Channel Sub-Category"].unique(), placeholder="All")
-    if ch_sub_category: df = df[df["Channel Sub-Category"].isin(ch_sub_category)]
-
-    cust_name = st.sidebar.multiselect(label="Customer Name", options=df["Customer Name"].unique(), placeholder="All")
-    if cust_name: df = df[df["Customer Name"].isin(cust_name)]
-
-    return df
+# ------------------------------- WHAT-IF SIMULATOR PAGE -------------------------------
+SIMULATOR_FILTERS = [
+    {"column": "YEAR", "label": "Year", "widget": "selectbox"},
+    {"column": "MONTH", "label": "Month", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Channel Category", "label": "Channel", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Product Category", "label": "Product Category", "widget": "multiselect", "placeholder": "All"},
+    {"column": "Product Family", "label": "Product Family", "widget": "multiselect", "placeholder": "All"},
+]
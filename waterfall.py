@@ -0,0 +1,72 @@
+from profiling import profiled
+
+# Price waterfall from list to pocket price. Every line's discounts are per-unit CAD amounts off the list price (a
+# missing amount is its rate x the list price); the price levels are what is left after each group of them:
+#   list price - standard discounts 1 and 2          = invoice price
+#   invoice price - special discount - promo campaign = net price (the data's Net Price [CAD])
+#   net price - rebates                               = pocket price
+# Lines are reduced to additive CAD totals (amount x quantity) in one vectorized pass and summed per group, so any
+# level of the hierarchies aggregates weighted by list revenue: a group's unit price is its total over its quantity,
+# and its leakage % is the share of its list revenue given away.
+
+
+# Step -> (rate column, per-unit CAD amount column)
+DISCOUNTS = {
+    "Standard Discount 1": ("Standard Discount [SD1 %]", "Standard Discount [SD1][CAD]"),
+    "Standard Discount 2": ("Standard Discount [SD2 %]", "Standard Discount [SD2][CAD]"),
+    "Special Discount": ("Special Discount [DSP %]", "Special Discount [DSP][CAD]"),
+    "Promo Campaign": ("Promo Campaign [DPR%]", "Promo Campaign [DPR][CAD]"),
+    "Rebates": ("Rebates [DREB%]", "Rebates [DREB][CAD]"),
+}
+
+# Each price level below list and the steps taken off the level above it to reach it
+LEVELS = [
+    ("Invoice", ["Standard Discount 1", "Standard Discount 2"]),
+    ("Net", ["Special Discount", "Promo Campaign"]),
+    ("Pocket", ["Rebates"]),
+]
+
+
+def line_amounts(df):
+    """The quantity, list revenue and each step's CAD total of every line."""
+    import numpy as np
+    import pandas as pd
+    list_price = df["List Price [CAD]"].to_numpy(dtype=float)
+    quantity = np.nan_to_num(df["QTY [Units]"].to_numpy(dtype=float))
+    amounts = {"QTY [Units]": quantity, "List [CAD]": np.nan_to_num(list_price) * quantity}
+    for step, (rate, amount) in DISCOUNTS.items():
+        unit = df[amount].to_numpy(dtype=float) if amount in df.columns else np.full(len(df), np.nan)
+        if rate in df.columns:
+            unit = np.where(np.isnan(unit), df[rate].to_numpy(dtype=float) * list_price, unit)
+        amounts[f"{step} [CAD]"] = np.nan_to_num(unit) * quantity
+    return pd.DataFrame(amounts, index=df.index)
+
+def levels(sums):
+    """Add the price levels' CAD totals and unit prices, and the leakage from list to pocket, to summed line amounts."""
+    import numpy as np
+    level = sums["List [CAD]"]
+    for name, steps in LEVELS:
+        level = level - sums[[f"{step} [CAD]" for step in steps]].sum(axis=1)
+        sums[f"{name} [CAD]"] = level
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name in ["List"] + [name for name, _ in LEVELS]:
+            sums[f"{name} Price"] = sums[f"{name} [CAD]"] / sums["QTY [Units]"]
+        sums["Leakage [CAD]"] = sums["List [CAD]"] - sums["Pocket [CAD]"]
+        sums["Leakage %"] = np.where(sums["List [CAD]"] != 0, sums["Leakage [CAD]"] / sums["List [CAD]"] * 100, np.nan)
+    return sums
+
+@profiled
+def waterfall(df, by=()):
+    """The waterfall of the lines in `df` per group of the `by` columns, or as a one-row total."""
+    import pandas as pd
+    amounts = line_amounts(df)
+    if by:
+        sums = amounts.groupby([df[column] for column in by], sort=True, observed=True).sum().reset_index()
+    else:
+        sums = pd.DataFrame([amounts.sum()])
+    return levels(sums)
+
+@profiled
+def leakage_ranking(df, dimension, n=10):
+    """The `n` values of `dimension` that give away the largest share of their list revenue between list and pocket."""
+    return waterfall(df, [dimension]).nlargest(n, "Leakage %").reset_index(drop=True)
@@ -0,0 +1,131 @@
+import streamlit as st
+
+from profiling import profiled, profiled_cache
+from utils import MONTHS_ORDER
+
+# What-if pricing simulator. A scenario changes list prices per product category, caps the special discount (DSP) per
+# channel and, optionally, moves quantities with a price elasticity of demand. The filtered rows are reduced once per
+# filter selection to the arrays a scenario needs (see build_base): segment and month codes, unit prices, discount
+# rates, revenue and cost. A slider move then only reprices those arrays and sums them per month or segment with
+# bincount; the filter cascade and the data are not touched again.
+#
+# Every line's net price moves by the list price change less its share of the standard, special and promo discounts,
+# plus the DSP the cap takes back; revenue follows the net price, quantity follows (new net / old net) ^ elasticity and
+# cost follows quantity. With no adjustments a scenario reproduces the data's Revenue, QTY and Total GM exactly. The
+# elasticity is one value for every line, or each line's SKU x channel estimate (see elasticity.py).
+
+
+# Adjustment -> the segment it is set per
+SEGMENTS = {"list price": "Product Category", "DSP cap": "Channel Category"}
+
+# Product SKU and Channel Category identify the series of the estimated elasticities
+SERIES = ["Product SKU", "Channel Category"]
+
+RATES = ["Standard Discount [SD1 %]", "Standard Discount [SD2 %]", "Special Discount [DSP %]", "Promo Campaign [DPR%]"]
+
+
+@profiled_cache(st.cache_resource, max_entries=8)
+def get_base(data_key, selection, _df):
+    """The simulation base of a filtered users frame, cached on its source key and filter selection."""
+    return build_base(_df)
+
+@profiled
+def build_base(df):
+    """
+    {"codes": {segment: row codes}, "labels": {segment: labels}, "month": row month positions, column: row values,
+    "baseline": the data's monthly sums}: the rows in a month of MONTHS_ORDER, as arrays.
+    """
+    import numpy as np
+    import pandas as pd
+    keep = df["MONTH"].isin(MONTHS_ORDER).to_numpy()
+
+    def values(column):  # only the columns read are masked, not the whole frame
+        array = df[column].to_numpy()
+        return array if keep.all() else array[keep]
+
+    positions = {month: position for position, month in enumerate(MONTHS_ORDER)}
+    base = {"codes": {}, "labels": {}, "month": pd.Series(values("MONTH")).map(positions).to_numpy(dtype=int)}
+    for segment in dict.fromkeys([*SEGMENTS.values(), *SERIES]):
+        codes, labels = pd.factorize(values(segment), use_na_sentinel=False)
+        base["codes"][segment], base["labels"][segment] = codes, list(labels)
+    for column in ["List Price [CAD]", "Revenue", "QTY [Units]", "Total GM [CAD]"] + RATES:
+        base[column] = np.nan_to_num(values(column).astype(float))
+    quantity = base["QTY [Units]"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        base["Net Price [CAD]"] = np.where(quantity != 0, base["Revenue"] / quantity, 0.0)
+    base["baseline"] = monthly(base, simulate(base))
+    return base
+
+@profiled
+def simulate(base, list_change=None, dsp_cap=None, elasticity=0.0):
+    """
+    Reprice the base's rows. `list_change` maps product categories to a fractional list price change, `dsp_cap` maps
+    channels to the highest DSP rate allowed; both default to no change. `elasticity` is a number or a row array (see
+    estimated_elasticity). Returns {column: row values} for the
+    scenario's revenue, quantity, GM and discount rates.
+    """
+    import numpy as np
+    list_price, net = base["List Price [CAD]"], base["Net Price [CAD]"]
+    change = segment_values(base, SEGMENTS["list price"], list_change or {}, 0.0)
+    cap = segment_values(base, SEGMENTS["DSP cap"], dsp_cap or {}, np.inf)
+    dsp = np.minimum(base["Special Discount [DSP %]"], cap)
+    discounts = sum(base[rate] for rate in RATES)
+    taken_back = base["Special Discount [DSP %]"] - dsp
+    new_net = net + list_price * change * (1 - discounts) + list_price * (1 + change) * taken_back
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_ratio = np.where(net > 0, new_net / net, 1.0)
+        volume_ratio = np.where(price_ratio > 0, price_ratio ** elasticity, 0.0) if np.any(elasticity) else 1.0
+    revenue = base["Revenue"] * price_ratio * volume_ratio
+    cost = (base["Revenue"] - base["Total GM [CAD]"]) * volume_ratio
+    return {"Revenue": revenue, "QTY [Units]": base["QTY [Units]"] * volume_ratio, "Total GM [CAD]": revenue - cost,
+            **{rate: base[rate] for rate in RATES}, "Special Discount [DSP %]": dsp}
+
+def segment_values(base, segment, values, default):
+    """A row array of each row's segment value from {label: value}, `default` for the labels not in `values`."""
+    import numpy as np
+    lookup = np.array([values.get(label, default) for label in base["labels"][segment]] or [default], dtype=float)
+    return lookup[base["codes"][segment]]
+
+def estimated_elasticity(base, estimates, default, lowest=-3.0):
+    """
+    A row array of each row's elasticity from an elasticity.fit frame of SERIES, clipped to [lowest, 0] as a positive
+    fit is mixing up price with something else; `default` for the rows whose series has no estimate.
+    """
+    import numpy as np
+    import pandas as pd
+    skus, channels = (base["labels"][column] for column in SERIES)
+    grid = (estimates.set_index(SERIES)["Elasticity"].reindex(pd.MultiIndex.from_product([skus, channels]))
+            .to_numpy().reshape(len(skus), len(channels)))
+    values = grid[base["codes"][SERIES[0]], base["codes"][SERIES[1]]]
+    return np.where(np.isnan(values), default, np.clip(values, lowest, 0.0))
+
+def sums(codes, size, lines):
+    """
+    Sum scenario rows by integer code: Revenue, QTY and GM are summed and the discount rates are averaged weighted by
+    revenue, so the result reads like the rows it sums (see plots.average_discount_rate_card).
+    """
+    import numpy as np
+    import pandas as pd
+    revenue = np.bincount(codes, weights=lines["Revenue"], minlength=size)
+    totals = {column: np.bincount(codes, weights=lines[column], minlength=size)
+              for column in ["Revenue", "QTY [Units]", "Total GM [CAD]"]}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for rate in RATES:
+            totals[rate] = np.bincount(codes, weights=lines[rate] * lines["Revenue"], minlength=size) / revenue
+    totals["Rows"] = np.bincount(codes, minlength=size)
+    return pd.DataFrame(totals)
+
+@profiled
+def monthly(base, lines):
+    """A scenario's sums per month, one row per month with data, in the shape the KPI cards group by MONTH."""
+    frame = sums(base["month"], len(MONTHS_ORDER), lines)
+    frame.insert(0, "MONTH", MONTHS_ORDER)
+    return frame[frame["Rows"] > 0].drop(columns="Rows").reset_index(drop=True)
+
+@profiled
+def by_segment(base, lines, segment):
+    """A scenario's sums per value of `segment` (one of SEGMENTS' columns)."""
+    labels = base["labels"][segment]
+    frame = sums(base["codes"][segment], len(labels), lines).drop(columns="Rows")
+    frame.insert(0, segment, labels)
+    return frame